@@ -2,8 +2,11 @@ from orbitals import datatypes
 from orbitals import definitions
 from orbitals import electron_functions
 from orbitals import tools
+from orbitals import resampling
+from orbitals import sections
 from orbitals import visualisation
 from orbitals import analysis
+from orbitals import batch
 
 __name__ = "orbitals"
 
@@ -12,6 +15,9 @@ __all__ = [
     "electron_functions",
     "definitions",
     "tools",
+    "resampling",
+    "sections",
     "analysis",
     "visualisation",
+    "batch",
 ]
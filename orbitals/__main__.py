@@ -0,0 +1,5 @@
+import sys
+
+from orbitals import batch
+
+sys.exit(batch.main())
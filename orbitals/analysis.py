@@ -1,10 +1,11 @@
+import numpy as np
 import skimage as ski
 
-from orbitals import datatypes, tools
+from orbitals import datatypes, electron_functions, resampling, tools
 
 
 def extract_isosurface(
-    wavefunction: datatypes.WavefunctionVolume, relative_threshold: float
+    wavefunction: datatypes.WavefunctionVolume, relative_threshold: float, exact_normals: bool = True
 ):
     """
     Extracts the isosurface of the electron density at a given threshold value.
@@ -12,13 +13,20 @@ def extract_isosurface(
     args:
     wavefunction: datatypes.WavefunctionVolume, wavefunction volume
     threshold: float, threshold value
+    exact_normals: bool, for atomic wavefunctions, compute normals from the
+        analytic gradient of the density at each vertex rather than finite differences
 
     returns:
-    tuple, (vertices, faces) of the isosurface
+    tuple, (vertices, faces, normals, values) of the isosurface
     """
 
+    # Marching cubes needs a dense cartesian box
+    if isinstance(wavefunction, datatypes.SparseWavefunction):
+        wavefunction = wavefunction.to_dense()
+    wavefunction = resampling.as_cartesian(wavefunction)
+
     abs_threshold = tools.abs_threshold_from_relative(
-        wavefunction.get_density(), relative_threshold
+        wavefunction, relative_threshold
     )
 
     verts, faces, normals, values = ski.measure.marching_cubes(
@@ -26,7 +34,55 @@ def extract_isosurface(
         level=abs_threshold,
     )
 
+    if exact_normals and isinstance(wavefunction, datatypes.OneEAtomicWavefunction):
+        normals = _exact_normals(wavefunction, verts, normals)
+
     return verts, faces, normals, values
 
 
+def _exact_normals(
+    wavefunction: datatypes.OneEAtomicWavefunction, verts: np.ndarray, fallback: np.ndarray
+) -> np.ndarray:
+    # Vertices (and normals) are in index space, along x, y, z after the swapaxes
+    coords = [wavefunction.get_coords()[dim].values for dim in wavefunction.get_dims()]
+    points = [np.interp(verts[:, i], np.arange(len(c)), c) for i, c in enumerate(coords)]
+    spacing = np.array([c[1] - c[0] for c in coords])
+
+    psi = electron_functions.wavefunction(
+        *wavefunction.get_quantum_numbers(),
+        *tools.convert_cartesian_to_radial(*points),
+        Z=wavefunction.get_nuclear_charge(),
+    )
+    gradient = electron_functions.wavefunction_gradient(
+        *wavefunction.get_quantum_numbers(), *points, Z=wavefunction.get_nuclear_charge()
+    )
+
+    # grad |psi|^2 = 2 Re(psi* grad psi), pointing away from the enclosed
+    # (denser) region like the marching cubes normals
+    normals = -2 * np.real(np.conj(psi)[:, None] * gradient) * spacing
+    norm = np.linalg.norm(normals, axis=-1, keepdims=True)
+
+    # Keep the finite difference normal where the gradient vanishes
+    return np.where(norm > 0, normals / np.where(norm > 0, norm, 1), fallback)
+
 
+def kinetic_energy_density(wavefunction: datatypes.OneEAtomicWavefunction) -> np.ndarray:
+    """
+    Returns the (positive definite) kinetic energy density 1/2 |grad psi|^2 at
+    each grid point, from the analytic gradient of the analytically normalised
+    wavefunction (not the grid normalised data), in units of hbar^2 / m_e with
+    lengths in Angstrom. Its integral over all space is the expectation value
+    of the kinetic energy, Z^2 / (2 n^2 a0^2).
+
+    args:
+    wavefunction: datatypes.OneEAtomicWavefunction, wavefunction volume
+
+    returns:
+    np.ndarray, kinetic energy density
+    """
+    gradient = electron_functions.wavefunction_gradient(
+        *wavefunction.get_quantum_numbers(),
+        *wavefunction.cartesian_points(),
+        Z=wavefunction.get_nuclear_charge(),
+    )
+    return 0.5 * np.sum(np.abs(gradient) ** 2, axis=-1)
@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import json
+import os
+import sys
+import time
+import traceback
+from pathlib import Path
+from typing import Optional
+
+import attrs
+import matplotlib
+import matplotlib.pyplot as plt
+
+from orbitals import analysis, datatypes, tools, visualisation
+from orbitals.definitions import CartesianCoords, RadialCoords
+
+COORDINATE_SYSTEMS = {
+    "cartesian": (datatypes.CartesianWavefunction, CartesianCoords),
+    "radial": (datatypes.RadialWavefunction, RadialCoords),
+}
+
+PLOT_TYPES = {
+    "points": ".png",
+    "isosurface": ".png",
+    "mesh": ".obj",
+}
+
+
+@attrs.define(frozen=True)
+class Job:
+    """
+    A single rendering job from a batch manifest.
+
+    args:
+    n: int, principal quantum number
+    l: int, azimuthal quantum number
+    m: int, magnetic quantum number
+    Z: int, nuclear charge
+    coordinates: str, "cartesian" or "radial"
+    resolution: int, grid points per dimension for evaluation
+    r_max: float, maximum radius of the grid, or None to choose it automatically
+    interpolate: int, grid points per dimension to interpolate to before plotting, or None
+    threshold: float, relative threshold for the plot
+    plot: str, "points", "isosurface" or "mesh"
+    name: str, output file name without extension
+    """
+
+    n: int
+    l: int
+    m: int
+    Z: int = 1
+    coordinates: str = "cartesian"
+    resolution: int = 20
+    r_max: Optional[float] = None
+    interpolate: Optional[int] = None
+    threshold: float = 0.3
+    plot: str = "isosurface"
+    name: Optional[str] = None
+
+    def __attrs_post_init__(self):
+        if self.coordinates not in COORDINATE_SYSTEMS:
+            raise ValueError(f"Unknown coordinate system: {self.coordinates}")
+        if self.plot not in PLOT_TYPES:
+            raise ValueError(f"Unknown plot type: {self.plot}")
+
+        if self.name is None:
+            name = f"{self.n}{self.l}{self.m}_{self.coordinates}_{self.resolution}_{self.plot}"
+            if self.Z != 1:
+                name = f"Z{self.Z}_{name}"
+
+            # Every other setting which changes the output, when not the default
+            if self.r_max is not None:
+                name += f"_r{self.r_max}"
+            if self.interpolate is not None:
+                name += f"_i{self.interpolate}"
+            if self.threshold != 0.3:
+                name += f"_t{self.threshold}"
+
+            object.__setattr__(self, "name", name)
+
+    def grid_key(self) -> tuple:
+        # Jobs with equal keys share a single evaluation of the wavefunction
+        return (self.coordinates, self.n, self.l, self.m, self.Z, self.resolution, self.r_max)
+
+    def output_path(self, output_dir: Path) -> Path:
+        return Path(output_dir) / f"{self.name}{PLOT_TYPES[self.plot]}"
+
+
+def read_manifest(path: str) -> tuple[list[Job], list[dict]]:
+    """
+    Reads a manifest of jobs, either a JSON list of job objects or JSONL with
+    one job object per line. Entries which are not valid jobs are reported
+    as failed results rather than aborting the whole manifest.
+
+    args:
+    path: str, path to the manifest
+
+    returns:
+    tuple, (jobs, results) with the valid jobs, and a failed result for
+        each invalid entry
+    """
+
+    text = Path(path).read_text()
+
+    try:
+        entries = json.loads(text)
+        if isinstance(entries, dict):
+            entries = [entries]
+        entries = [(f"entry {i}", entry) for i, entry in enumerate(entries)]
+    except json.JSONDecodeError:
+        entries = [
+            (f"line {i + 1}", line)
+            for i, line in enumerate(text.splitlines())
+            if line.strip()
+        ]
+
+    jobs, failed = [], []
+    for location, entry in entries:
+        try:
+            if isinstance(entry, str):
+                entry = json.loads(entry)
+            jobs.append(Job(**entry))
+        except Exception:
+            name = entry.get("name") if isinstance(entry, dict) else None
+            failed.append(
+                {
+                    "name": name or f"{Path(path).name} {location}",
+                    "status": "failed",
+                    "eval_time": 0.0,
+                    "render_time": 0.0,
+                    "error": traceback.format_exc(),
+                }
+            )
+
+    return jobs, failed
+
+
+def _resolution(job: Job, points: int) -> dict:
+    return {dim: points for dim in COORDINATE_SYSTEMS[job.coordinates][1]}
+
+
+def _write_obj(path: str, verts, faces):
+    with open(path, "w") as f:
+        for vert in verts:
+            f.write("v {} {} {}\n".format(*vert))
+        for face in faces + 1:
+            f.write("f {} {} {}\n".format(*face))
+
+
+def _render(job: Job, wavefunction: datatypes.WavefunctionVolume, path: Path):
+    # Write to a partial file first, so interrupted jobs are not mistaken
+    # for finished ones when resuming.
+    partial = path.with_name(path.name + ".partial")
+
+    if job.plot == "mesh":
+        verts, faces, _, _ = analysis.extract_isosurface(wavefunction, job.threshold)
+        _write_obj(partial, verts, faces)
+    else:
+        if job.plot == "points":
+            fig, _ = visualisation.plot_clipped_points(wavefunction, job.threshold)
+        else:
+            fig, _ = visualisation.plot_isosurface(wavefunction, job.threshold)
+        fig.savefig(partial, format="png")
+        plt.close(fig)
+
+    os.replace(partial, path)
+
+
+def run_jobs(jobs: list[Job], output_dir: str) -> list[dict]:
+    """
+    Runs a group of jobs sharing the same grid, evaluating the wavefunction
+    once. Failures are caught and reported per job.
+
+    args:
+    jobs: list[Job], jobs with equal grid keys
+    output_dir: str, directory to write outputs to
+
+    returns:
+    list[dict], one result per job with its name, status, timings and error
+    """
+
+    matplotlib.use("Agg")
+
+    wavefunction, error = None, None
+    job = jobs[0]
+
+    start = time.perf_counter()
+    try:
+        wavefunction_type = COORDINATE_SYSTEMS[job.coordinates][0]
+        wavefunction = wavefunction_type.new_1e_atomic_wavefunction(
+            resolution=_resolution(job, job.resolution),
+            r_max=job.r_max,
+            n=job.n,
+            l=job.l,
+            m=job.m,
+            Z=job.Z,
+        )
+        wavefunction.eval_wavefunction()
+    except Exception:
+        error = traceback.format_exc()
+    eval_time = time.perf_counter() - start
+
+    interpolated = {}
+    results = []
+    for job in jobs:
+        result = {"name": job.name, "eval_time": eval_time, "render_time": 0.0}
+
+        if error is not None:
+            results.append({**result, "status": "failed", "error": error})
+            continue
+
+        start = time.perf_counter()
+        try:
+            volume = wavefunction
+            if job.interpolate is not None:
+                if job.interpolate not in interpolated:
+                    interpolated[job.interpolate] = tools.interpolate_grid_function(
+                        wavefunction, _resolution(job, job.interpolate)
+                    )
+                volume = interpolated[job.interpolate]
+
+            _render(job, volume, job.output_path(Path(output_dir)))
+            result["status"] = "done"
+        except Exception:
+            result["status"] = "failed"
+            result["error"] = traceback.format_exc()
+        result["render_time"] = time.perf_counter() - start
+
+        results.append(result)
+
+    return results
+
+
+def run_batch(
+    jobs: list[Job], output_dir: str, workers: Optional[int] = None, force: bool = False
+) -> list[dict]:
+    """
+    Runs a batch of jobs across a process pool. Jobs whose output already
+    exists are skipped unless force is set, so an interrupted batch can be
+    rerun to resume it.
+
+    args:
+    jobs: list[Job], jobs to run
+    output_dir: str, directory to write outputs to
+    workers: int, number of worker processes, defaults to the number of CPUs
+    force: bool, rerun jobs whose output already exists
+
+    returns:
+    list[dict], one result per job
+    """
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    results = []
+    groups = {}
+    outputs = {}
+    for job in jobs:
+        # Jobs writing the same file would overwrite each other, keep the first
+        path = job.output_path(Path(output_dir))
+        if path in outputs:
+            results.append(
+                {
+                    "name": job.name,
+                    "status": "failed",
+                    "eval_time": 0.0,
+                    "render_time": 0.0,
+                    "error": f"Output {path} is already written by an earlier job, {outputs[path].name}.",
+                }
+            )
+            _report(results[-1])
+            continue
+        outputs[path] = job
+
+        if not force and path.exists():
+            results.append({"name": job.name, "status": "skipped"})
+            _report(results[-1])
+            continue
+        groups.setdefault(job.grid_key(), []).append(job)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(run_jobs, group, output_dir) for group in groups.values()
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            for result in future.result():
+                results.append(result)
+                _report(result)
+
+    return results
+
+
+def _report(result: dict):
+    if result["status"] == "skipped":
+        print(f"{result['name']}: skipped, output exists")
+        return
+
+    print(
+        f"{result['name']}: {result['status']} "
+        f"(eval {result['eval_time']:.2f}s, render {result['render_time']:.2f}s)"
+    )
+    if result["status"] == "failed":
+        print(result["error"], file=sys.stderr)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m orbitals",
+        description="Render a batch of orbitals described by a JSON/JSONL manifest.",
+    )
+    parser.add_argument("manifest", help="JSON list or JSONL file of jobs")
+    parser.add_argument("-o", "--output-dir", default=".", help="directory for outputs")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--force", action="store_true", help="rerun jobs whose output already exists")
+    args = parser.parse_args(argv)
+
+    jobs, results = read_manifest(args.manifest)
+    for result in results:
+        _report(result)
+
+    results += run_batch(jobs, args.output_dir, workers=args.workers, force=args.force)
+
+    failed = [result for result in results if result["status"] == "failed"]
+    print(f"{len(results) - len(failed)}/{len(results)} jobs succeeded")
+
+    return 1 if failed else 0
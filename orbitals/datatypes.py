@@ -4,31 +4,131 @@ from re import S
 import xarray as xr
 import numpy as np
 import attrs
+import collections
+import weakref
+from typing import Iterator, Optional
 
 from orbitals import electron_functions
 from orbitals.definitions import CartesianCoords, RadialCoords, QuantumNumbers
 from orbitals import tools
 
 
+def _axis_distance(coords: np.ndarray) -> float:
+    # Smallest distance from the origin along one axis over a block of coordinates
+    if coords[0] <= 0 <= coords[-1]:
+        return 0.0
+    return min(abs(coords[0]), abs(coords[-1]))
+
+
 @attrs.define
 class WavefunctionVolume:
+    """
+    Base class for wavefunction volumes.
+
+    Derived quantities (density, its range and percentiles, meshgrid
+    coordinates) are computed once and cached. The cache is dropped whenever
+    the wavefunction DataArray or its data is replaced, e.g. by
+    eval_wavefunction. While anything is cached the data is read-only, so
+    in-place edits (e.g. volume.wavefunction *= 2) raise rather than leave
+    the cache stale. Assign new data instead, or call invalidate_cache()
+    first to edit in place. pass_counts records how many times each quantity
+    has actually been computed.
+    """
 
     wavefunction: xr.DataArray
 
     resolution: dict
     r_max: float
 
+    _cache: dict = attrs.field(factory=dict, init=False, repr=False, eq=False)
+    pass_counts: collections.Counter = attrs.field(factory=collections.Counter, init=False, repr=False, eq=False)
+
     def _normalize(self):
         # Normalise so sum of elements is 1
-        self.wavefunction.data /= np.sum(np.abs(self.wavefunction.data))
+        self.wavefunction.data = self.wavefunction.data / np.sum(np.abs(self.wavefunction.data))
+        self.invalidate_cache()
+
+    def invalidate_cache(self):
+        self._cache.clear()
+
+        # Allow in-place edits again, until something is next cached
+        try:
+            self.wavefunction.data.flags.writeable = True
+        except ValueError:
+            # e.g. the read-only placeholder, which is never writable
+            pass
+
+    def _cached(self, key, compute):
+        # Weak references, so replacing the DataArray or its data (without
+        # keeping the old one alive) always invalidates the cache.
+        owner = self._cache.get("owner")
+        if (
+            owner is None
+            or owner[0]() is not self.wavefunction
+            or owner[1]() is not self.wavefunction.data
+        ):
+            self._cache.clear()
+            self._cache["owner"] = (
+                weakref.ref(self.wavefunction),
+                weakref.ref(self.wavefunction.data),
+            )
+
+            # Cached values are only valid while the data is unchanged
+            self.wavefunction.data.flags.writeable = False
+
+        if key not in self._cache:
+            self.pass_counts[key if isinstance(key, str) else key[0]] += 1
+            value = compute()
+
+            # Shared between callers, so must not be modified in place
+            for array in value if isinstance(value, (list, tuple)) else [value]:
+                if isinstance(array, np.ndarray):
+                    array.flags.writeable = False
+
+            self._cache[key] = value
+
+        return self._cache[key]
 
     def meshgrid_coords(self) -> list[np.ndarray]:
-        return np.meshgrid(*[coord for coord in self.get_coords().values()])
+        return self._cached(
+            "meshgrid",
+            lambda: np.meshgrid(*[self.get_coords()[dim].values for dim in self.get_dims()]),
+        )
+
+    def cartesian_points(self) -> list[np.ndarray]:
+        """
+        Returns the cartesian (x, y, z) coordinates of each point, laid out
+        like the data, converting from radial coordinates where needed.
+        """
+        if set(self.resolution.keys()) == set(CartesianCoords):
+            return self.meshgrid_coords()
+        return tools.convert_radial_to_cartesian(*self.meshgrid_coords())
 
     def get_density(self) -> np.ndarray:
-        density = np.absolute(self.get_wavefunction().data) ** 2
-        density /= np.sum(np.abs(density))
-        return density
+        def _density():
+            density = np.absolute(self.get_wavefunction().data) ** 2
+            density /= np.sum(np.abs(density))
+            return density
+
+        return self._cached("density", _density)
+
+    def get_density_range(self) -> tuple[float, float]:
+        """
+        Returns the minimum and maximum of the electron density, ignoring nans.
+        """
+        density = self.get_density()
+        return self._cached(
+            "range", lambda: (float(np.nanmin(density)), float(np.nanmax(density)))
+        )
+
+    def get_density_percentile(self, q: float) -> float:
+        """
+        Returns the q-th percentile of the electron density, ignoring nans.
+        """
+        density = self.get_density()
+        return self._cached(
+            ("percentile", q), lambda: float(np.nanpercentile(density, q))
+        )
 
     def get_wavefunction(self):
         return self.wavefunction.data
@@ -53,10 +153,159 @@ class OneEAtomicWavefunction(WavefunctionVolume):
             self.wavefunction.attrs[QuantumNumbers.M],
         )
 
+    def get_nuclear_charge(self):
+        return self.wavefunction.attrs.get("Z", 1)
+
+    def _data_scale(self) -> complex:
+        # Ratio of the stored (normalised) wavefunction to the analytic one,
+        # taken at the largest stored value.
+        data = self.get_wavefunction()
+        i = np.unravel_index(np.argmax(np.abs(data)), data.shape)
+        point = [coord[i] for coord in self.cartesian_points()]
+        return data[i] / electron_functions.cartesian_wavefunction(*self.get_quantum_numbers(), *point, Z=self.get_nuclear_charge())
+
+    def get_gradient(self) -> np.ndarray:
+        """
+        Returns the analytic gradient of the evaluated wavefunction at each
+        grid point, scaled consistently with get_wavefunction(). Accurate even
+        on coarse grids, unlike finite differences.
+
+        returns:
+        np.ndarray, (..., 3) gradient, with x, y and z components along the last axis
+        """
+        return self._cached(
+            "gradient",
+            lambda: self._data_scale() * electron_functions.wavefunction_gradient(
+                *self.get_quantum_numbers(), *self.cartesian_points(), Z=self.get_nuclear_charge()
+            ),
+        )
+
+    def get_laplacian(self) -> np.ndarray:
+        """
+        Returns the analytic Laplacian of the evaluated wavefunction at each
+        grid point, scaled consistently with get_wavefunction().
+
+        returns:
+        np.ndarray, Laplacian of the wavefunction
+        """
+        return self._cached(
+            "laplacian",
+            lambda: self._data_scale() * electron_functions.wavefunction_laplacian(
+                *self.get_quantum_numbers(), *self.cartesian_points(), Z=self.get_nuclear_charge()
+            ),
+        )
+
     @classmethod
-    def new_1e_atomic_wavefunction(cls, resolution: dict, r_max: float,  n: int, l: int, m: int) -> OneEAtomicWavefunction:
+    def new_1e_atomic_wavefunction(cls, resolution: dict, r_max: Optional[float],  n: int, l: int, m: int, enclosed_fraction: float = 0.99, Z: int = 1, reference: Optional[OneEAtomicWavefunction] = None) -> OneEAtomicWavefunction:
+        raise NotImplementedError
+
+    @staticmethod
+    def auto_r_max(n: int, l: int, enclosed_fraction: float = 0.99, Z: int = 1) -> float:
+        """
+        Returns the radius which encloses a given fraction of the electron's
+        probability, from the analytic radial density. Used in place of r_max
+        when none is given.
+
+        args:
+        n: int, principal quantum number
+        l: int, azimuthal quantum number
+        enclosed_fraction: float, fraction of the probability to enclose
+        Z: int, nuclear charge
+
+        returns:
+        float, radius enclosing the requested fraction
+        """
+        return electron_functions.enclosing_radius(n, l, enclosed_fraction, Z)
+
+    def _rescale_from(self, reference: OneEAtomicWavefunction):
+        """
+        Fills this volume from an evaluated volume with the same quantum numbers
+        and a different nuclear charge, without evaluating any special functions.
+
+        Since psi_Z(r) = Z^(3/2) psi_1(Z r), a grid which is the reference grid
+        shrunk by Z_ref / Z holds exactly the same values, so the data is only
+        relabelled. Any other grid is linearly interpolated from the reference,
+        so is only as accurate as the reference grid is fine, and must lie
+        within it once scaled.
+
+        args:
+        reference: OneEAtomicWavefunction, evaluated volume of the same type and (n, l, m)
+        """
+
+        if type(reference) is not type(self) or reference.get_quantum_numbers() != self.get_quantum_numbers():
+            raise ValueError("Reference must be the same type of volume, with the same quantum numbers.")
+
+        scale = self.get_nuclear_charge() / reference.get_nuclear_charge()
+
+        if reference.resolution == self.resolution and np.isclose(self.r_max * scale, reference.r_max):
+            self.wavefunction.data = reference.get_wavefunction().copy()
+        else:
+            points = [
+                coord * scale if dim in self._scaled_dims else coord
+                for dim, coord in zip(self.get_dims(), self.meshgrid_coords())
+            ]
+            self.wavefunction.data = tools.sample_grid_function(reference, points)
+
+        self._normalize()
+
+    def _eval_points(self, c1: np.ndarray, c2: np.ndarray, c3: np.ndarray) -> np.ndarray:
+        # Evaluate the (unnormalised) wavefunction at points in this volume's coordinate system
         raise NotImplementedError
 
+    def _normalization_constant(self, density: bool = False) -> float:
+        # Sum of |psi| (or |psi|^2) over the whole grid, as used by _normalize
+        # and get_density, accumulated one slab at a time.
+        power = 2 if density else 1
+        return sum(
+            np.sum(np.abs(slab) ** power)
+            for slab in self.iter_slabs(normalize=False)
+        )
+
+    def iter_slabs(self, density: bool = False, normalize: bool = True) -> Iterator[np.ndarray]:
+        """
+        Evaluates the wavefunction one slab of the first data axis at a time,
+        so only O(N^2) values are ever resident. Slab i is equal to
+        get_wavefunction()[i] (or get_density()[i]) after eval_wavefunction.
+
+        With normalize, the normalisation constant is computed in a first pass
+        over the grid so the streamed slabs match the fully evaluated volume.
+        Radial volumes compute it from their separable factors, but cartesian
+        volumes evaluate the whole grid twice, so streaming costs about twice
+        as much as eval_wavefunction.
+
+        The same buffer is yielded for every slab, copy it if it needs to
+        outlive the next iteration.
+
+        args:
+        density: bool, yield the electron density rather than the wavefunction
+        normalize: bool, normalise the slabs as eval_wavefunction would
+
+        yields:
+        np.ndarray, wavefunction or density on one slab
+        """
+
+        # Data follows the np.meshgrid layout, so the first data axis runs
+        # along the second coordinate.
+        c1, c2, c3 = [self.get_coords()[dim].values for dim in self.get_dims()]
+        aa, cc = np.meshgrid(c1, c3, indexing="ij")
+        bb = np.empty_like(aa)
+
+        norm = self._normalization_constant(density) if normalize else 1.0
+
+        buffer = np.empty(aa.shape, dtype=float if density else complex)
+        for value in c2:
+            bb.fill(value)
+            psi = self._eval_points(aa, bb, cc)
+
+            if density:
+                np.abs(psi, out=buffer)
+                buffer **= 2
+            else:
+                buffer[...] = psi
+
+            buffer /= norm
+            yield buffer
+
 @attrs.define
 class RadialWavefunction(OneEAtomicWavefunction):
     """
@@ -64,27 +313,39 @@ class RadialWavefunction(OneEAtomicWavefunction):
 
     args:
     resolution: dict, resolution of the wavefunction
-    r_max: int, maximum radius of the wavefunction
+    r_max: int, maximum radius of the wavefunction, or None to choose it
+        automatically so the grid encloses enclosed_fraction of the probability
 
     attrs:
     wavefunction: xarray.DataArray, radial electron wavefunction
     """
 
+    # Coordinates which scale with 1/Z
+    _scaled_dims = (RadialCoords.R,)
+
     @classmethod
-    def new_1e_atomic_wavefunction(cls, resolution: dict, r_max: float,  n: int, l: int, m: int) -> RadialWavefunction:
+    def new_1e_atomic_wavefunction(cls, resolution: dict, r_max: Optional[float],  n: int, l: int, m: int, enclosed_fraction: float = 0.99, Z: int = 1, reference: Optional[OneEAtomicWavefunction] = None) -> RadialWavefunction:
 
         # Check that we've been provided with physically meaningful inputs
         assert tools.validate_quantum_numbers(n, l, m)
         assert set(resolution.keys()) == set(RadialCoords)
 
+        if r_max is None and reference is not None:
+            r_max = reference.r_max * reference.get_nuclear_charge() / Z
+        elif r_max is None:
+            r_max = cls.auto_r_max(n, l, enclosed_fraction, Z)
+
         # Radial wavefunction with coords r, phi, psi
         wavefunction = xr.DataArray(
-            data=np.ones(
+            # Placeholder until eval_wavefunction, a read-only broadcast view
+            # which costs no memory, so streamed volumes stay O(N^2)
+            data=np.broadcast_to(
+                1.0,
                 (
                     resolution[RadialCoords.R],
                     resolution[RadialCoords.THETA],
                     resolution[RadialCoords.PHI],
-                )
+                ),
             ),
             dims=[RadialCoords.R, RadialCoords.THETA, RadialCoords.PHI],
             coords={
@@ -100,13 +361,19 @@ class RadialWavefunction(OneEAtomicWavefunction):
             },
             attrs={
                 "resolution": resolution,
+                "Z": Z,
                 QuantumNumbers.N: n,
                 QuantumNumbers.L: l,
                 QuantumNumbers.M: m,
             },
         )
 
-        return cls(wavefunction=wavefunction, resolution=resolution, r_max=r_max)
+        volume = cls(wavefunction=wavefunction, resolution=resolution, r_max=r_max)
+
+        if reference is not None:
+            volume._rescale_from(reference)
+
+        return volume
 
     def eval_wavefunction(self):
 
@@ -117,20 +384,47 @@ class RadialWavefunction(OneEAtomicWavefunction):
             self.wavefunction.attrs[QuantumNumbers.M],
         )
 
-        rr, tt, pp = np.meshgrid(
-            self.wavefunction.coords[RadialCoords.R],
-            self.wavefunction.coords[RadialCoords.THETA],
-            self.wavefunction.coords[RadialCoords.PHI],
-        )
+        radial_line, shell = self._separable_factors()
 
-        self.wavefunction.data = electron_functions.wavefunction(
-            self.wavefunction.attrs[QuantumNumbers.N],
-            self.wavefunction.attrs[QuantumNumbers.L],
-            self.wavefunction.attrs[QuantumNumbers.M],
-            rr, tt, pp)
+        # Data follows the np.meshgrid layout, (theta, r, phi)
+        self.wavefunction.data = shell[:, None, :] * radial_line[None, :, None]
 
         self._normalize()
 
+    def _eval_points(self, rr: np.ndarray, tt: np.ndarray, pp: np.ndarray) -> np.ndarray:
+        return electron_functions.wavefunction(
+            *self.get_quantum_numbers(), rr, tt, pp, Z=self.get_nuclear_charge()
+        )
+
+    def _separable_factors(self) -> tuple[np.ndarray, np.ndarray]:
+        # psi(r, theta, phi) = f(r) g(theta, phi), so the whole grid follows
+        # from one radial line and one angular shell, i.e. O(N^2) evaluations
+        # rather than O(N^3). Returns f along r and g on (theta, phi).
+        rs, ts, ps = [self.get_coords()[dim].values for dim in self.get_dims()]
+
+        # Reference radius and angles where neither factor vanishes
+        n, l, _ = self.get_quantum_numbers()
+        r0 = rs[np.argmax(np.abs(electron_functions.radial_function(n, l, rs, self.get_nuclear_charge())))]
+
+        tt, pp = np.meshgrid(ts, ps, indexing="ij")
+        shell = self._eval_points(np.full_like(tt, r0), tt, pp)
+
+        i0 = np.unravel_index(np.argmax(np.abs(shell)), shell.shape)
+        if shell[i0] == 0:
+            return np.zeros_like(rs, dtype=shell.dtype), shell
+
+        radial_line = self._eval_points(
+            rs, np.full_like(rs, tt[i0]), np.full_like(rs, pp[i0])
+        ) / shell[i0]
+
+        return radial_line, shell
+
+    def _normalization_constant(self, density: bool = False) -> float:
+        # The sum over the grid factorises along with psi
+        radial_line, shell = self._separable_factors()
+        power = 2 if density else 1
+
+        return float(np.sum(np.abs(radial_line) ** power) * np.sum(np.abs(shell) ** power))
 
 @attrs.define
 class CartesianWavefunction(OneEAtomicWavefunction):
@@ -139,7 +433,8 @@ class CartesianWavefunction(OneEAtomicWavefunction):
 
     args:
     resolution: dict, resolution of the wavefunction
-    r_max: int, maximum radius of the wavefunction
+    r_max: int, maximum radius of the wavefunction, or None to choose it
+        automatically so the grid encloses enclosed_fraction of the probability
 
     attrs:
     wavefunction: xarray.DataArray, radial electron wavefunction
@@ -151,15 +446,27 @@ class CartesianWavefunction(OneEAtomicWavefunction):
     # Cartesian wavefunction with coords x, y, z
     # wavefunction = attrs.field(init=False)
 
+    # Coordinates which scale with 1/Z
+    _scaled_dims = tuple(CartesianCoords)
+
     @classmethod
-    def new_1e_atomic_wavefunction(cls, resolution: dict, r_max: float,  n: int, l: int, m: int) -> CartesianWavefunction:
+    def new_1e_atomic_wavefunction(cls, resolution: dict, r_max: Optional[float],  n: int, l: int, m: int, enclosed_fraction: float = 0.99, Z: int = 1, reference: Optional[OneEAtomicWavefunction] = None) -> CartesianWavefunction:
+
+        if r_max is None and reference is not None:
+            r_max = reference.r_max * reference.get_nuclear_charge() / Z
+        elif r_max is None:
+            r_max = cls.auto_r_max(n, l, enclosed_fraction, Z)
+
         wavefunction = xr.DataArray(
-            data=np.ones(
+            # Placeholder until eval_wavefunction, a read-only broadcast view
+            # which costs no memory, so streamed volumes stay O(N^2)
+            data=np.broadcast_to(
+                1.0,
                 (
                     resolution[CartesianCoords.X],
                     resolution[CartesianCoords.Y],
                     resolution[CartesianCoords.Z],
-                )
+                ),
             ),
             dims=[CartesianCoords.X, CartesianCoords.Y, CartesianCoords.Z],
             coords={
@@ -175,13 +482,19 @@ class CartesianWavefunction(OneEAtomicWavefunction):
             },
             attrs={
                 "resolution": resolution,
+                "Z": Z,
                 QuantumNumbers.N: n,
                 QuantumNumbers.L: l,
                 QuantumNumbers.M: m,
             },
         )
 
-        return cls(wavefunction=wavefunction, resolution=resolution, r_max=r_max)
+        volume = cls(wavefunction=wavefunction, resolution=resolution, r_max=r_max)
+
+        if reference is not None:
+            volume._rescale_from(reference)
+
+        return volume
 
     def eval_wavefunction(self):
 
@@ -198,13 +511,388 @@ class CartesianWavefunction(OneEAtomicWavefunction):
             self.wavefunction.coords[CartesianCoords.Z],
         )
 
-        rr, tt, pp = tools.convert_cartesian_to_radial(xx, yy, zz)
+        self.wavefunction.data = self._eval_points(xx, yy, zz)
 
-        self.wavefunction.data = electron_functions.wavefunction(
-            self.wavefunction.attrs[QuantumNumbers.N],
-            self.wavefunction.attrs[QuantumNumbers.L],
-            self.wavefunction.attrs[QuantumNumbers.M],
-            rr, tt, pp
+        self._normalize()
+
+    def _eval_points(self, xx: np.ndarray, yy: np.ndarray, zz: np.ndarray) -> np.ndarray:
+        return electron_functions.cartesian_wavefunction(*self.get_quantum_numbers(), xx, yy, zz, Z=self.get_nuclear_charge())
+
+
+@attrs.define
+class SparseWavefunction(OneEAtomicWavefunction):
+    """
+    Sparse electron wavefunction class. Only voxels of the bounding grid with a
+    density above a floor, relative to the analytic peak density of the
+    orbital (electron_functions.peak_density), are stored, so memory and
+    plotting cost scale with the occupied volume rather than the box.
+
+    The wavefunction is a 1D xarray.DataArray along a "voxel" dimension, with
+    the cartesian (or radial) coordinates of each voxel as non-dimension
+    coordinates, so get_density, tools.clip_density and
+    visualisation.plot_clipped_points work on it directly.
+
+    args:
+    resolution: dict, resolution of the bounding grid
+    r_max: int, maximum radius of the bounding grid
+    indices: np.ndarray, (n_voxels, 3) indices of each voxel in the dense data
+
+    attrs:
+    wavefunction: xarray.DataArray, electron wavefunction at the stored voxels
+    """
+
+    indices: np.ndarray = attrs.field(factory=lambda: np.empty((0, 3), dtype=int))
+
+    @classmethod
+    def new_1e_atomic_wavefunction(cls, resolution: dict, r_max: Optional[float],  n: int, l: int, m: int, enclosed_fraction: float = 0.99, Z: int = 1, reference: Optional[OneEAtomicWavefunction] = None, density_floor: float = 1e-3, brick_size: int = 16) -> SparseWavefunction:
+        """
+        Evaluates a cartesian wavefunction brick by brick, keeping only voxels
+        with a density of at least density_floor times the analytic peak
+        density. Bricks lying entirely outside the analytic cutoff radius are
+        never evaluated, and hold no voxels above the floor, so the stored
+        voxels do not depend on brick_size.
+
+        Building from a reference volume is not supported, rescale a dense
+        volume and use from_volume instead.
+        """
+
+        if reference is not None:
+            raise ValueError(
+                "Sparse wavefunctions cannot be built from a reference, use from_volume on a rescaled dense volume."
+            )
+
+        assert tools.validate_quantum_numbers(n, l, m)
+        assert set(resolution.keys()) == set(CartesianCoords)
+
+        if r_max is None:
+            r_max = cls.auto_r_max(n, l, enclosed_fraction, Z)
+
+        # |psi|^2 <= R_nl^2 max|Y_lm|^2, so beyond the radius where R_nl^2 falls
+        # below density_floor times its peak, no voxel is above the floor.
+        cutoff = electron_functions.density_cutoff_radius(n, l, density_floor, Z)
+        peak = electron_functions.peak_density(n, l, m, Z)
+
+        # Data layout follows np.meshgrid, i.e. (y, x, z)
+        xs = np.linspace(-r_max, r_max, resolution[CartesianCoords.X])
+        ys = np.linspace(-r_max, r_max, resolution[CartesianCoords.Y])
+        zs = np.linspace(-r_max, r_max, resolution[CartesianCoords.Z])
+
+        blocks = []
+        for i0 in range(0, len(ys), brick_size):
+            for j0 in range(0, len(xs), brick_size):
+                for k0 in range(0, len(zs), brick_size):
+                    bx = xs[j0 : j0 + brick_size]
+                    by = ys[i0 : i0 + brick_size]
+                    bz = zs[k0 : k0 + brick_size]
+
+                    nearest = np.sqrt(
+                        _axis_distance(bx) ** 2
+                        + _axis_distance(by) ** 2
+                        + _axis_distance(bz) ** 2
+                    )
+                    if nearest > cutoff:
+                        continue
+
+                    xx, yy, zz = np.meshgrid(bx, by, bz)
+                    psi = electron_functions.cartesian_wavefunction(n, l, m, xx, yy, zz, Z=Z)
+                    density = np.abs(psi) ** 2
+
+                    keep = density >= density_floor * peak
+
+                    blocks.append(
+                        (
+                            np.argwhere(keep) + [i0, j0, k0],
+                            psi[keep],
+                            xx[keep],
+                            yy[keep],
+                            zz[keep],
+                        )
+                    )
+
+        indices, psi, x, y, z = (
+            np.concatenate(parts) for parts in zip(*blocks)
         )
 
-        self._normalize()
\ No newline at end of file
+        wavefunction = xr.DataArray(
+            data=psi,
+            dims=["voxel"],
+            coords={
+                CartesianCoords.X: ("voxel", x),
+                CartesianCoords.Y: ("voxel", y),
+                CartesianCoords.Z: ("voxel", z),
+            },
+            attrs={
+                "resolution": resolution,
+                "density_floor": density_floor,
+                "Z": Z,
+                QuantumNumbers.N: n,
+                QuantumNumbers.L: l,
+                QuantumNumbers.M: m,
+            },
+        )
+
+        sparse = cls(
+            wavefunction=wavefunction,
+            resolution=resolution,
+            r_max=r_max,
+            indices=indices,
+        )
+        sparse._normalize()
+
+        return sparse
+
+    @classmethod
+    def from_volume(cls, volume: OneEAtomicWavefunction, density_floor: float) -> SparseWavefunction:
+        """
+        Returns a sparse copy of an evaluated dense wavefunction, keeping only
+        voxels with a density of at least density_floor times the analytic
+        peak density, as new_1e_atomic_wavefunction does.
+
+        args:
+        volume: OneEAtomicWavefunction, evaluated dense wavefunction
+        density_floor: float, density floor relative to the analytic peak density
+
+        returns:
+        SparseWavefunction, sparse wavefunction
+        """
+
+        density = volume.get_density()
+        # The analytic peak, in the normalisation of get_density()
+        peak = (
+            electron_functions.peak_density(*volume.get_quantum_numbers(), volume.get_nuclear_charge())
+            * np.abs(volume._data_scale()) ** 2
+            / np.sum(np.abs(volume.get_wavefunction()) ** 2)
+        )
+        keep = density >= density_floor * peak
+
+        wavefunction = xr.DataArray(
+            data=volume.get_wavefunction()[keep],
+            dims=["voxel"],
+            coords={
+                dim: ("voxel", coord[keep])
+                for dim, coord in zip(volume.get_dims(), volume.meshgrid_coords())
+            },
+            attrs={**volume.wavefunction.attrs, "density_floor": density_floor},
+        )
+
+        return cls(
+            wavefunction=wavefunction,
+            resolution=volume.resolution,
+            r_max=volume.r_max,
+            indices=np.argwhere(keep),
+        )
+
+    def iter_slabs(self, density: bool = False, normalize: bool = True) -> Iterator[np.ndarray]:
+        raise TypeError(
+            "Sparse wavefunctions are not stored in slabs, convert with to_dense() first."
+        )
+
+    def meshgrid_coords(self) -> list[np.ndarray]:
+        # Per-voxel coordinates, aligned with the stored wavefunction
+        return [coord.values for coord in self.get_coords().values()]
+
+    def eval_wavefunction(self):
+
+        # Check that we've been provided with physically meaningful inputs
+        assert tools.validate_quantum_numbers(*self.get_quantum_numbers())
+
+        if set(self.resolution.keys()) == set(CartesianCoords):
+            self.wavefunction.data = electron_functions.cartesian_wavefunction(
+                *self.get_quantum_numbers(), *self.meshgrid_coords(), Z=self.get_nuclear_charge()
+            )
+        else:
+            self.wavefunction.data = electron_functions.wavefunction(
+                *self.get_quantum_numbers(), *self.meshgrid_coords(), Z=self.get_nuclear_charge()
+            )
+
+        self._normalize()
+
+    def to_dense(self) -> OneEAtomicWavefunction:
+        """
+        Returns the dense wavefunction on the bounding grid, with zeros at the
+        voxels which were not stored.
+        """
+
+        if set(self.resolution.keys()) == set(CartesianCoords):
+            dense_type = CartesianWavefunction
+        else:
+            dense_type = RadialWavefunction
+
+        dense = dense_type.new_1e_atomic_wavefunction(
+            self.resolution, self.r_max, *self.get_quantum_numbers(), Z=self.get_nuclear_charge()
+        )
+
+        data = np.zeros(dense.wavefunction.shape, dtype=self.get_wavefunction().dtype)
+        data[tuple(self.indices.T)] = self.get_wavefunction()
+        dense.wavefunction.data = data
+
+        return dense
+
+
+def _brick_slices(coords: np.ndarray, centre: float, extent: float) -> slice:
+    # Grid points along one axis within extent of the centre
+    lo = np.searchsorted(coords, centre - extent, side="left")
+    hi = np.searchsorted(coords, centre + extent, side="right")
+    return slice(lo, hi)
+
+
+@attrs.define
+class CompositeWavefunction(WavefunctionVolume):
+    """
+    Superposition of hydrogen-like orbitals on several centres, e.g. hybrid or
+    LCAO molecular orbitals, on a shared cartesian grid.
+
+    Each contribution is only evaluated inside the brick of grid points within
+    its density cutoff radius, and accumulated into the volume in place, so
+    the cost scales with the number of centres rather than centres times box
+    volume. Contributions whose centres lie on grid points are translated
+    copies of one template per distinct (n, l, m, Z), which is evaluated once.
+    pass_counts records the number of templates and bricks evaluated.
+
+    args:
+    resolution: dict, resolution of the grid
+    r_max: float, maximum extent of the grid along each axis
+    centres: np.ndarray, (n_centres, 3) cartesian centre of each contribution
+    quantum_numbers: np.ndarray, (n_centres, 3) n, l and m of each contribution
+    coefficients: np.ndarray, (n_centres,) coefficient of each contribution
+    charges: np.ndarray, (n_centres,) nuclear charge of each contribution
+    density_floor: float, density relative to each contribution's peak beyond
+        which it is neglected
+
+    attrs:
+    wavefunction: xarray.DataArray, electron wavefunction
+    """
+
+    centres: np.ndarray = attrs.field(factory=lambda: np.empty((0, 3)))
+    quantum_numbers: np.ndarray = attrs.field(factory=lambda: np.empty((0, 3), dtype=int))
+    coefficients: np.ndarray = attrs.field(factory=lambda: np.empty(0, dtype=complex))
+    charges: np.ndarray = attrs.field(factory=lambda: np.empty(0, dtype=int))
+    density_floor: float = 1e-5
+
+    @classmethod
+    def new_composite_wavefunction(cls, resolution: dict, r_max: Optional[float], centres, quantum_numbers, coefficients, Z=1, enclosed_fraction: float = 0.99, density_floor: float = 1e-5) -> CompositeWavefunction:
+        """
+        args:
+        resolution: dict, resolution of the grid
+        r_max: float, maximum extent of the grid along each axis, or None to
+            enclose enclosed_fraction of the probability of every contribution
+        centres: (n_centres, 3) cartesian centre of each contribution
+        quantum_numbers: (n_centres, 3) n, l and m of each contribution
+        coefficients: (n_centres,) coefficient of each contribution
+        Z: int, or (n_centres,) nuclear charge of each contribution
+        enclosed_fraction: float, enclosed probability used to choose r_max
+        density_floor: float, density relative to each contribution's peak
+            beyond which it is neglected
+
+        returns:
+        CompositeWavefunction, unevaluated composite wavefunction
+        """
+
+        assert set(resolution.keys()) == set(CartesianCoords)
+
+        centres = np.asarray(centres, dtype=float).reshape(-1, 3)
+        quantum_numbers = np.asarray(quantum_numbers, dtype=int).reshape(-1, 3)
+        coefficients = np.asarray(coefficients, dtype=complex).reshape(-1)
+        charges = np.broadcast_to(np.asarray(Z, dtype=int), coefficients.shape).copy()
+
+        if not len(centres) == len(quantum_numbers) == len(coefficients):
+            raise ValueError(
+                "Centres, quantum numbers and coefficients must have one entry per contribution."
+            )
+
+        if r_max is None:
+            r_max = max(
+                np.max(np.abs(centre))
+                + OneEAtomicWavefunction.auto_r_max(n, l, enclosed_fraction, charge)
+                for centre, (n, l, _), charge in zip(centres, quantum_numbers, charges)
+            )
+
+        wavefunction = xr.DataArray(
+            # Placeholder until eval_wavefunction, a read-only broadcast view
+            # which costs no memory, so streamed volumes stay O(N^2)
+            data=np.broadcast_to(
+                1.0,
+                (
+                    resolution[CartesianCoords.Y],
+                    resolution[CartesianCoords.X],
+                    resolution[CartesianCoords.Z],
+                ),
+            ),
+            dims=[CartesianCoords.X, CartesianCoords.Y, CartesianCoords.Z],
+            coords={
+                dim: np.linspace(-r_max, r_max, resolution[dim]) for dim in CartesianCoords
+            },
+            attrs={"resolution": resolution, "density_floor": density_floor},
+        )
+
+        return cls(
+            wavefunction=wavefunction,
+            resolution=resolution,
+            r_max=r_max,
+            centres=centres,
+            quantum_numbers=quantum_numbers,
+            coefficients=coefficients,
+            charges=charges,
+            density_floor=density_floor,
+        )
+
+    def eval_wavefunction(self):
+
+        # Check that we've been provided with physically meaningful inputs
+        for n, l, m in self.quantum_numbers:
+            assert tools.validate_quantum_numbers(n, l, m)
+
+        axes = [self.wavefunction.coords[dim].values for dim in CartesianCoords]
+        spacing = np.array([coords[1] - coords[0] for coords in axes])
+
+        # Data layout follows np.meshgrid, i.e. (y, x, z)
+        data = np.zeros((len(axes[1]), len(axes[0]), len(axes[2])), dtype=complex)
+
+        templates = {}
+        for centre, (n, l, m), coefficient, Z in zip(
+            self.centres, self.quantum_numbers, self.coefficients, self.charges
+        ):
+            cutoff = electron_functions.density_cutoff_radius(n, l, self.density_floor, Z)
+
+            steps = (centre - [coords[0] for coords in axes]) / spacing
+            if np.allclose(steps, np.round(steps), atol=1e-6):
+                # Centred on a grid point, so the brick is a translated template
+                extent = np.floor(cutoff / spacing + 1e-9).astype(int)
+
+                key = (n, l, m, Z)
+                if key not in templates:
+                    self.pass_counts["template"] += 1
+                    offsets = [h * np.arange(-k, k + 1) for h, k in zip(spacing, extent)]
+                    templates[key] = electron_functions.cartesian_wavefunction(n, l, m, *np.meshgrid(*offsets), Z=Z)
+
+                # Clip the template to the part which overlaps the grid
+                bricks, parts = [], []
+                for step, k, coords in zip(np.round(steps).astype(int), extent, axes):
+                    lo, hi = max(step - k, 0), min(step + k + 1, len(coords))
+                    bricks.append(slice(lo, hi))
+                    parts.append(slice(lo - (step - k), hi - (step - k)))
+
+                if any(brick.start >= brick.stop for brick in bricks):
+                    continue
+
+                template = templates[key][parts[1], parts[0], parts[2]]
+                data[bricks[1], bricks[0], bricks[2]] += coefficient * template
+            else:
+                bricks = [
+                    _brick_slices(coords, c, cutoff) for coords, c in zip(axes, centre)
+                ]
+
+                if any(brick.start >= brick.stop for brick in bricks):
+                    continue
+
+                self.pass_counts["brick"] += 1
+                xx, yy, zz = np.meshgrid(
+                    *[coords[brick] - c for coords, brick, c in zip(axes, bricks, centre)]
+                )
+                data[bricks[1], bricks[0], bricks[2]] += coefficient * electron_functions.cartesian_wavefunction(
+                    n, l, m, xx, yy, zz, Z=Z
+                )
+
+        self.wavefunction.data = data
+
+        self._normalize()
@@ -1,45 +1,316 @@
+import math
+
 import numpy as np
 import scipy
+import scipy.integrate
+import scipy.special
 from orbitals import definitions as d
 
 
-@np.vectorize(excluded=["n", "l", "m"])
-def wavefunction(n: int, l: int, m: int, r: float, theta: float, phi: float) -> float:
+def wavefunction(n: int, l: int, m: int, r: np.ndarray, theta: np.ndarray, phi: np.ndarray, Z: int = 1) -> np.ndarray:
     """
-    Returns the wavefunction for a given electron in a hydrogen atom in radial coordinates.
-    For quantum numbers n, l, and m, and spherical coordinates r, phi, and theta.
+    Returns the wavefunction for a given electron in a hydrogen-like atom in radial coordinates.
+    For quantum numbers n, l, and m, and spherical coordinates r, theta, and phi.
+    Evaluated elementwise over arrays of coordinates.
 
     args:
     n: int, principal quantum number
     l: int, azimuthal quantum number
     m: int, magnetic quantum number
 
-    r: float, radial coordinate
-    phi: float, azimuthal angle
-    theta: float, polar angle
+    r: np.ndarray, radial coordinate
+    theta: np.ndarray, azimuthal angle
+    phi: np.ndarray, polar angle
+
+    Z: int, nuclear charge
 
     returns:
-    float, wavefunction value
+    np.ndarray, wavefunction values
     """
 
-    def _prefactor(n, l):
-        return (
-            (2 / (3 * n * d.A_0_STAR)) ** 3
-            * (np.math.factorial(n - l - 1) / np.math.factorial(2 * n * (n + 1)))
-        ) ** (1 / 2)
+    # scipy takes the azimuthal angle first, then the polar angle
+    return radial_function(n, l, r, Z) * scipy.special.sph_harm(m, l, theta, phi)
+
+
+def radial_function(n: int, l: int, r: np.ndarray, Z: int = 1) -> np.ndarray:
+    """
+    Returns the normalised radial part R_nl(r) of the hydrogen-like wavefunction,
+    such that the integral of r^2 R_nl(r)^2 over r from 0 to infinity is 1.
 
-    def _rho_terms(n, l):
-        rho = 2 * r / (n * d.A_0_STAR)
+    args:
+    n: int, principal quantum number
+    l: int, azimuthal quantum number
+    r: np.ndarray, radial coordinate
+    Z: int, nuclear charge
 
-        return (
-            np.exp(-rho / 2)
-            * pow(rho, l)
-            * scipy.special.genlaguerre(n - l - 1, 2 * l + 1)(rho)
-        )
+    returns:
+    np.ndarray, radial function values
+    """
+    a_0 = d.A_0_STAR / Z
+    rho = 2 * np.asarray(r, dtype=float) / (n * a_0)
 
-    def _spherical_harmonic_term(l, m, phi, theta):
-        return scipy.special.sph_harm(m, l, phi, theta)
+    prefactor = np.sqrt(
+        (2 / (n * a_0)) ** 3
+        * math.factorial(n - l - 1)
+        / (2 * n * math.factorial(n + l))
+    )
 
     return (
-        _prefactor(n, l) * _rho_terms(n, l) * _spherical_harmonic_term(l, m, phi, theta)
+        prefactor
+        * np.exp(-rho / 2)
+        * rho**l
+        * scipy.special.eval_genlaguerre(n - l - 1, 2 * l + 1, rho)
     )
+
+
+def radial_probability_density(n: int, l: int, r: np.ndarray, Z: int = 1) -> np.ndarray:
+    """
+    Returns the radial probability density r^2 R_nl(r)^2, i.e. the probability
+    per unit radius of finding the electron in a shell at radius r.
+
+    args:
+    n: int, principal quantum number
+    l: int, azimuthal quantum number
+    r: np.ndarray, radial coordinate
+    Z: int, nuclear charge
+
+    returns:
+    np.ndarray, radial probability density
+    """
+    return np.asarray(r, dtype=float) ** 2 * radial_function(n, l, r, Z) ** 2
+
+
+def _radial_sample_points(n: int, samples: int = 8192) -> np.ndarray:
+    # Hydrogenic densities decay as exp(-2r / (n a0)), so this comfortably
+    # contains everything up to round-off for any n.
+    return np.linspace(0, 8 * n * (n + 2) * d.A_0_STAR, samples)
+
+
+def enclosing_radius(n: int, l: int, fraction: float, Z: int = 1) -> float:
+    """
+    Returns the radius of the sphere which encloses a given fraction of the
+    total probability for an orbital with quantum numbers n and l.
+
+    args:
+    n: int, principal quantum number
+    l: int, azimuthal quantum number
+    fraction: float, enclosed probability, between 0 and 1
+    Z: int, nuclear charge
+
+    returns:
+    float, enclosing radius
+    """
+
+    if fraction <= 0 or fraction >= 1:
+        raise ValueError("Enclosed fraction must be between 0 and 1.")
+
+    r = _radial_sample_points(n)
+    cumulative = scipy.integrate.cumulative_trapezoid(
+        radial_probability_density(n, l, r), r, initial=0
+    )
+
+    # All lengths scale as 1/Z
+    return float(r[np.searchsorted(cumulative / cumulative[-1], fraction)]) / Z
+
+
+def density_cutoff_radius(n: int, l: int, relative_floor: float, Z: int = 1) -> float:
+    """
+    Returns the radius beyond which R_nl(r)^2 stays below a fraction of its
+    peak value. Since the angular part is bounded, no point further than this
+    from the nucleus can have a density above relative_floor times the peak.
+
+    args:
+    n: int, principal quantum number
+    l: int, azimuthal quantum number
+    relative_floor: float, density floor relative to the peak, between 0 and 1
+    Z: int, nuclear charge
+
+    returns:
+    float, cutoff radius
+    """
+
+    if relative_floor <= 0 or relative_floor >= 1:
+        raise ValueError("Relative floor must be between 0 and 1.")
+
+    r = _radial_sample_points(n)
+    radial_density = radial_function(n, l, r) ** 2
+
+    above_floor = np.flatnonzero(radial_density >= relative_floor * radial_density.max())
+
+    # Step one sample outwards so the cutoff bounds the last crossing.
+    return float(r[min(above_floor[-1] + 1, len(r) - 1)]) / Z
+
+
+def peak_density(n: int, l: int, m: int, Z: int = 1) -> float:
+    """
+    Returns the largest value of |psi|^2 over all space, the product of the
+    peaks of R_nl(r)^2 and |Y_lm|^2, found on fine samples of r and the polar
+    angle (|Y_lm| does not depend on the azimuthal angle).
+
+    args:
+    n: int, principal quantum number
+    l: int, azimuthal quantum number
+    m: int, magnetic quantum number
+    Z: int, nuclear charge
+
+    returns:
+    float, peak density
+    """
+
+    r = _radial_sample_points(n) / Z
+    polar = np.linspace(0, np.pi, 4097)
+
+    return float(
+        np.max(radial_function(n, l, r, Z) ** 2)
+        * np.max(np.abs(scipy.special.sph_harm(m, l, 0, polar)) ** 2)
+    )
+
+
+def _spherical_coords(x: np.ndarray, y: np.ndarray, z: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # (r, theta, phi) with the angles taken as 0 at the origin, where any angle will do
+    r = np.sqrt(x**2 + y**2 + z**2)
+    theta = np.arctan2(y, x)
+    phi = np.arccos(np.clip(np.divide(z, r, out=np.ones_like(r), where=r > 0), -1, 1))
+    return r, theta, phi
+
+
+def _laguerre(k: int, alpha: int, rho: np.ndarray) -> np.ndarray:
+    # Generalised Laguerre polynomial, zero for negative degree (as for derivatives)
+    if k < 0:
+        return np.zeros_like(rho)
+    return scipy.special.eval_genlaguerre(k, alpha, rho)
+
+
+def _radial_envelope(n: int, l: int, r: np.ndarray, Z: int = 1) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # f(r) = R_nl(r) / r^l, which is smooth at the origin, and its first and
+    # second derivatives with respect to r.
+    a_0 = d.A_0_STAR / Z
+    k = 2 / (n * a_0)
+    rho = k * r
+
+    prefactor = np.sqrt(
+        k**3 * math.factorial(n - l - 1) / (2 * n * math.factorial(n + l))
+    ) * k**l
+
+    # d/drho L_j^a(rho) = -L_{j-1}^{a+1}(rho)
+    laguerre = _laguerre(n - l - 1, 2 * l + 1, rho)
+    d_laguerre = -_laguerre(n - l - 2, 2 * l + 2, rho)
+    d2_laguerre = _laguerre(n - l - 3, 2 * l + 3, rho)
+
+    exponential = prefactor * np.exp(-rho / 2)
+
+    f = exponential * laguerre
+    df = k * exponential * (d_laguerre - laguerre / 2)
+    d2f = k**2 * exponential * (d2_laguerre - d_laguerre + laguerre / 4)
+
+    return f, df, d2f
+
+
+def _solid_harmonic(l: int, m: int, r: np.ndarray, theta: np.ndarray, phi: np.ndarray) -> np.ndarray:
+    # r^l Y_lm, a homogeneous polynomial in x, y and z
+    if l < 0 or abs(m) > l:
+        return np.zeros(np.shape(r), dtype=complex)
+    return r**l * scipy.special.sph_harm(m, l, theta, phi)
+
+
+def _solid_harmonic_gradient(l: int, m: int, r: np.ndarray, theta: np.ndarray, phi: np.ndarray) -> np.ndarray:
+    # Gradient of r^l Y_lm, from the ladder relations between solid harmonics
+    # of degree l and l - 1, so it is well defined at the poles and origin.
+    if l == 0:
+        return np.zeros((*np.shape(r), 3), dtype=complex)
+
+    c = np.sqrt((2 * l + 1) / (2 * l - 1))
+
+    d_z = c * np.sqrt((l - m) * (l + m)) * _solid_harmonic(l - 1, m, r, theta, phi)
+    d_plus = c * np.sqrt((l - m) * (l - m - 1)) * _solid_harmonic(l - 1, m + 1, r, theta, phi)
+    d_minus = -c * np.sqrt((l + m) * (l + m - 1)) * _solid_harmonic(l - 1, m - 1, r, theta, phi)
+
+    # d_plus = d/dx + i d/dy, d_minus = d/dx - i d/dy
+    return np.stack(
+        [(d_plus + d_minus) / 2, (d_plus - d_minus) / 2j, d_z], axis=-1
+    )
+
+
+def cartesian_wavefunction(n: int, l: int, m: int, x: np.ndarray, y: np.ndarray, z: np.ndarray, Z: int = 1) -> np.ndarray:
+    """
+    Returns the hydrogen-like wavefunction at cartesian points, evaluated
+    elementwise over arrays of coordinates.
+
+    args:
+    n: int, principal quantum number
+    l: int, azimuthal quantum number
+    m: int, magnetic quantum number
+    x: np.ndarray, x coordinate
+    y: np.ndarray, y coordinate
+    z: np.ndarray, z coordinate
+    Z: int, nuclear charge
+
+    returns:
+    np.ndarray, wavefunction values
+    """
+    x, y, z = np.broadcast_arrays(*[np.asarray(c, dtype=float) for c in (x, y, z)])
+    return wavefunction(n, l, m, *_spherical_coords(x, y, z), Z=Z)
+
+
+def wavefunction_gradient(n: int, l: int, m: int, x: np.ndarray, y: np.ndarray, z: np.ndarray, Z: int = 1) -> np.ndarray:
+    """
+    Returns the analytic gradient of the hydrogen-like wavefunction at
+    cartesian points, e.g. grid points or isosurface mesh vertices. The
+    gradient is not defined at the nucleus for s orbitals (cusp), where it is
+    taken to be zero.
+
+    args:
+    n: int, principal quantum number
+    l: int, azimuthal quantum number
+    m: int, magnetic quantum number
+    x: np.ndarray, x coordinate
+    y: np.ndarray, y coordinate
+    z: np.ndarray, z coordinate
+    Z: int, nuclear charge
+
+    returns:
+    np.ndarray, (..., 3) gradient, with x, y and z components along the last axis
+    """
+
+    x, y, z = np.broadcast_arrays(*[np.asarray(c, dtype=float) for c in (x, y, z)])
+    r, theta, phi = _spherical_coords(x, y, z)
+
+    # psi = f(r) S(x, y, z), with S = r^l Y_lm
+    f, df, _ = _radial_envelope(n, l, r, Z)
+    solid = _solid_harmonic(l, m, r, theta, phi)
+
+    unit = np.stack(
+        [np.divide(c, r, out=np.zeros_like(r), where=r > 0) for c in (x, y, z)], axis=-1
+    )
+
+    return (df * solid)[..., None] * unit + f[..., None] * _solid_harmonic_gradient(l, m, r, theta, phi)
+
+
+def wavefunction_laplacian(n: int, l: int, m: int, x: np.ndarray, y: np.ndarray, z: np.ndarray, Z: int = 1) -> np.ndarray:
+    """
+    Returns the analytic Laplacian of the hydrogen-like wavefunction at
+    cartesian points. For s orbitals it diverges at the nucleus.
+
+    args:
+    n: int, principal quantum number
+    l: int, azimuthal quantum number
+    m: int, magnetic quantum number
+    x: np.ndarray, x coordinate
+    y: np.ndarray, y coordinate
+    z: np.ndarray, z coordinate
+    Z: int, nuclear charge
+
+    returns:
+    np.ndarray, Laplacian of the wavefunction
+    """
+
+    x, y, z = np.broadcast_arrays(*[np.asarray(c, dtype=float) for c in (x, y, z)])
+    r, theta, phi = _spherical_coords(x, y, z)
+
+    # S = r^l Y_lm is harmonic, so lap(f S) = (f'' + 2 (l + 1) f' / r) S,
+    # with S / r = r^(l-1) Y_lm finite away from the nucleus of s orbitals.
+    f, df, d2f = _radial_envelope(n, l, r, Z)
+    harmonic = scipy.special.sph_harm(m, l, theta, phi)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (d2f * r**l + 2 * (l + 1) * df * r ** (l - 1.0)) * harmonic
@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import collections
+
+import attrs
+import numpy as np
+from typing import Optional
+
+from orbitals import datatypes
+from orbitals.definitions import CartesianCoords, RadialCoords
+
+
+def _axis_weights(
+    coords: np.ndarray, values: np.ndarray, period: Optional[float] = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Lower and upper neighbour indices and the linear weight of the upper one,
+    # for each value along a single (monotonic) source axis.
+
+    n = len(coords)
+
+    if period is not None:
+        values = coords[0] + np.mod(values - coords[0], period)
+
+        # A grid which doesn't already repeat its first point (e.g. 0 and 2pi)
+        # wraps around from its last point back to the first.
+        if not np.isclose(coords[-1] - coords[0], period):
+            coords = np.append(coords, coords[0] + period)
+
+    lower = np.clip(np.searchsorted(coords, values, side="right") - 1, 0, len(coords) - 2)
+    upper = lower + 1
+
+    # Clamped, so points past the ends of a non-periodic axis (e.g. a polar
+    # grid which stops short of the poles) take the edge values.
+    weight = np.clip((values - coords[lower]) / (coords[upper] - coords[lower]), 0, 1)
+
+    return lower, np.mod(upper, n), weight
+
+
+@attrs.define
+class ResamplingPlan:
+    """
+    Reusable gather table for resampling a volume on one grid onto another.
+    Each target point holds the flat indices of its 8 neighbouring source
+    points and their trilinear weights, so resampling any number of volumes on
+    the same source grid is a single vectorized take-and-weight pass.
+    Indices are int32 and weights float32 where they fit, about 64 bytes per
+    target point.
+
+    args:
+    source_shape: tuple, shape of the source data
+    source_r_max: float, maximum radius of the source grid
+    indices: np.ndarray, (n_targets, 8) flat indices into the source data
+    weights: np.ndarray, (n_targets, 8) trilinear weights
+    resolution: dict, resolution of the target grid
+    r_max: float, maximum radius of the target grid
+    """
+
+    source_shape: tuple
+    source_r_max: float
+    indices: np.ndarray
+    weights: np.ndarray
+
+    resolution: dict
+    r_max: float
+
+    @classmethod
+    def spherical_to_cartesian(
+        cls,
+        source: datatypes.RadialWavefunction,
+        resolution: Optional[dict] = None,
+        r_max: Optional[float] = None,
+    ) -> ResamplingPlan:
+        """
+        Builds a plan from the (r, theta, phi) grid of a radial wavefunction to
+        a cartesian grid. Only the grid of the source is used, so the plan
+        applies to any volume on that grid.
+
+        Theta (azimuthal) is treated as periodic. At the poles and the origin,
+        where the angles are undefined, every neighbour holds the same value,
+        so any choice of angle gives the right result. Target points further
+        than the source's r_max from the origin get zero weight.
+
+        args:
+        source: datatypes.RadialWavefunction, volume defining the source grid
+        resolution: dict, resolution of the target grid, by default as many
+            points along each axis as the source has radially
+        r_max: float, maximum radius of the target grid, defaults to the source's
+
+        returns:
+        ResamplingPlan, plan from the source grid to the cartesian grid
+        """
+
+        assert set(source.resolution.keys()) == set(RadialCoords)
+
+        if r_max is None:
+            r_max = source.r_max
+        if resolution is None:
+            resolution = {dim: source.resolution[RadialCoords.R] for dim in CartesianCoords}
+
+        # Target points, laid out as by np.meshgrid like any other volume
+        xx, yy, zz = np.meshgrid(
+            np.linspace(-r_max, r_max, resolution[CartesianCoords.X]),
+            np.linspace(-r_max, r_max, resolution[CartesianCoords.Y]),
+            np.linspace(-r_max, r_max, resolution[CartesianCoords.Z]),
+        )
+        xx, yy, zz = xx.ravel(), yy.ravel(), zz.ravel()
+
+        rr = np.sqrt(xx**2 + yy**2 + zz**2)
+        tt = np.arctan2(yy, xx)
+        pp = np.arccos(np.divide(zz, rr, out=np.ones_like(rr), where=rr > 0))
+
+        coords = source.get_coords()
+        r_lo, r_hi, r_w = _axis_weights(coords[RadialCoords.R].values, rr)
+        t_lo, t_hi, t_w = _axis_weights(coords[RadialCoords.THETA].values, tt, period=2 * np.pi)
+        p_lo, p_hi, p_w = _axis_weights(coords[RadialCoords.PHI].values, pp)
+
+        # Source data follows the np.meshgrid layout, (theta, r, phi)
+        source_shape = source.wavefunction.shape
+        indices, weights = [], []
+        for t_i, t_wi in ((t_lo, 1 - t_w), (t_hi, t_w)):
+            for r_i, r_wi in ((r_lo, 1 - r_w), (r_hi, r_w)):
+                for p_i, p_wi in ((p_lo, 1 - p_w), (p_hi, p_w)):
+                    indices.append(np.ravel_multi_index((t_i, r_i, p_i), source_shape))
+                    weights.append(t_wi * r_wi * p_wi)
+
+        index_type = np.int32 if np.prod(source_shape) < np.iinfo(np.int32).max else np.int64
+        weights = np.stack(weights, axis=-1).astype(np.float32)
+        weights[rr > coords[RadialCoords.R].values[-1]] = 0
+
+        return cls(
+            source_shape=source_shape,
+            source_r_max=source.r_max,
+            indices=np.stack(indices, axis=-1).astype(index_type),
+            weights=weights,
+            resolution=resolution,
+            r_max=r_max,
+        )
+
+    def target_shape(self) -> tuple:
+        # As laid out by np.meshgrid, (y, x, z)
+        return (
+            self.resolution[CartesianCoords.Y],
+            self.resolution[CartesianCoords.X],
+            self.resolution[CartesianCoords.Z],
+        )
+
+    def apply(self, data: np.ndarray) -> np.ndarray:
+        """
+        Resamples data on the source grid onto the target grid. Any leading
+        axes are treated as a stack of volumes, all resampled in one pass.
+
+        args:
+        data: np.ndarray, (..., *source_shape) data on the source grid
+
+        returns:
+        np.ndarray, (..., *target_shape) data on the target grid
+        """
+
+        if data.shape[-3:] != tuple(self.source_shape):
+            raise ValueError(
+                f"Data of shape {data.shape[-3:]} does not match the plan's source grid {self.source_shape}."
+            )
+
+        # One neighbour at a time, so only a single target-sized array is
+        # gathered at once
+        flat = data.reshape(*data.shape[:-3], -1)
+        resampled = np.zeros((*data.shape[:-3], len(self.indices)), dtype=np.result_type(data, float))
+        for k in range(self.indices.shape[-1]):
+            resampled += np.take(flat, self.indices[:, k], axis=-1) * self.weights[:, k]
+
+        return resampled.reshape(*data.shape[:-3], *self.target_shape())
+
+    def to_cartesian(
+        self, sources: list[datatypes.RadialWavefunction]
+    ) -> list[datatypes.CartesianWavefunction]:
+        """
+        Resamples evaluated radial wavefunctions onto the cartesian grid,
+        stacking them so the whole list is resampled in a single pass.
+
+        args:
+        sources: list[datatypes.RadialWavefunction], evaluated wavefunctions on the source grid
+
+        returns:
+        list[datatypes.CartesianWavefunction], normalised cartesian wavefunctions
+        """
+
+        for source in sources:
+            if not np.isclose(source.r_max, self.source_r_max):
+                raise ValueError("Wavefunctions must be on the plan's source grid.")
+
+        resampled = self.apply(np.stack([source.get_wavefunction() for source in sources]))
+
+        volumes = []
+        for source, data in zip(sources, resampled):
+            volume = datatypes.CartesianWavefunction.new_1e_atomic_wavefunction(
+                self.resolution,
+                self.r_max,
+                *source.get_quantum_numbers(),
+                Z=source.get_nuclear_charge(),
+            )
+            volume.wavefunction.data = data
+            volume._normalize()
+            volumes.append(volume)
+
+        return volumes
+
+
+# Default plans for recently used source grids, most recent last
+_PLAN_CACHE: collections.OrderedDict = collections.OrderedDict()
+_PLAN_CACHE_SIZE = 4
+
+
+def default_plan(source: datatypes.RadialWavefunction) -> ResamplingPlan:
+    """
+    Returns the plan to the default cartesian grid for a radial volume. Plans
+    depend only on the source grid, so the last few are cached and shared by
+    every volume on the same grid.
+
+    args:
+    source: datatypes.RadialWavefunction, volume defining the source grid
+
+    returns:
+    ResamplingPlan, plan from the source grid to the default cartesian grid
+    """
+
+    coords = source.get_coords()
+    key = (
+        source.wavefunction.shape,
+        tuple(coords[dim].values.tobytes() for dim in RadialCoords),
+    )
+
+    if key in _PLAN_CACHE:
+        _PLAN_CACHE.move_to_end(key)
+    else:
+        _PLAN_CACHE[key] = ResamplingPlan.spherical_to_cartesian(source)
+        if len(_PLAN_CACHE) > _PLAN_CACHE_SIZE:
+            _PLAN_CACHE.popitem(last=False)
+
+    return _PLAN_CACHE[key]
+
+
+def as_cartesian(
+    wavefunction: datatypes.WavefunctionVolume,
+) -> datatypes.WavefunctionVolume:
+    """
+    Returns a radial wavefunction resampled onto a cartesian grid with as many
+    points along each axis as it has radially, for plotting and analysis which
+    need a cartesian box. Any other volume is returned unchanged.
+
+    args:
+    wavefunction: datatypes.WavefunctionVolume, wavefunction volume
+
+    returns:
+    datatypes.WavefunctionVolume, cartesian wavefunction volume
+    """
+
+    if not isinstance(wavefunction, datatypes.RadialWavefunction):
+        return wavefunction
+
+    return default_plan(wavefunction).to_cartesian([wavefunction])[0]
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import numpy as np
+import xarray as xr
+from typing import Union
+
+from orbitals import electron_functions, tools
+from orbitals.definitions import CartesianCoords, QuantumNumbers
+
+
+def _section(
+    n: int, l: int, m: int, points: np.ndarray, dims: list, coords: dict, Z: int, density: bool
+) -> xr.DataArray:
+    # Evaluate at (..., 3) cartesian points and wrap with the section's coordinates
+
+    assert tools.validate_quantum_numbers(n, l, m)
+
+    values = electron_functions.cartesian_wavefunction(n, l, m, *np.moveaxis(points, -1, 0), Z=Z)
+    if density:
+        values = np.abs(values) ** 2
+
+    return xr.DataArray(
+        data=values,
+        dims=dims,
+        coords={
+            **coords,
+            **{dim: (tuple(dims), points[..., i]) for i, dim in enumerate(CartesianCoords)},
+        },
+        attrs={
+            "density": density,
+            "Z": Z,
+            QuantumNumbers.N: n,
+            QuantumNumbers.L: l,
+            QuantumNumbers.M: m,
+        },
+    )
+
+
+def evaluate_plane(
+    n: int,
+    l: int,
+    m: int,
+    origin,
+    u,
+    v,
+    resolution: Union[int, tuple[int, int]],
+    Z: int = 1,
+    density: bool = False,
+) -> xr.DataArray:
+    """
+    Evaluates the wavefunction (or density) directly on a plane, without
+    building a volume. The plane is the parallelogram origin + s u + t v for
+    s and t from -1 to 1, so e.g. an xz map around the nucleus is
+    origin=(0, 0, 0), u=(r_max, 0, 0), v=(0, 0, r_max).
+
+    Values are the analytically normalised wavefunction, or |psi|^2 per unit
+    volume, rather than normalised over the grid as volumes are.
+
+    args:
+    n: int, principal quantum number
+    l: int, azimuthal quantum number
+    m: int, magnetic quantum number
+    origin: (3,) cartesian centre of the plane
+    u: (3,) first in-plane vector
+    v: (3,) second in-plane vector
+    resolution: int, or (int, int), number of points along u and v
+    Z: int, nuclear charge
+    density: bool, evaluate |psi|^2 rather than psi
+
+    returns:
+    xarray.DataArray, values with dims ("s", "t"), the distances from the origin
+        along u and v, and the cartesian position of every point as x, y and z
+    """
+
+    origin, u, v = (np.asarray(vector, dtype=float) for vector in (origin, u, v))
+    n_s, n_t = np.broadcast_to(resolution, (2,))
+
+    s = np.linspace(-1, 1, n_s)
+    t = np.linspace(-1, 1, n_t)
+    points = origin + s[:, None, None] * u + t[None, :, None] * v
+
+    return _section(
+        n, l, m, points,
+        dims=["s", "t"],
+        coords={"s": s * np.linalg.norm(u), "t": t * np.linalg.norm(v)},
+        Z=Z,
+        density=density,
+    )
+
+
+def evaluate_line(
+    n: int,
+    l: int,
+    m: int,
+    start,
+    end,
+    resolution: int,
+    Z: int = 1,
+    density: bool = False,
+) -> xr.DataArray:
+    """
+    Evaluates the wavefunction (or density) directly along a straight line
+    from start to end, e.g. a radial profile from the nucleus.
+
+    Values are the analytically normalised wavefunction, or |psi|^2 per unit
+    volume, rather than normalised over the grid as volumes are.
+
+    args:
+    n: int, principal quantum number
+    l: int, azimuthal quantum number
+    m: int, magnetic quantum number
+    start: (3,) cartesian start of the line
+    end: (3,) cartesian end of the line
+    resolution: int, number of points along the line
+    Z: int, nuclear charge
+    density: bool, evaluate |psi|^2 rather than psi
+
+    returns:
+    xarray.DataArray, values with dim "distance" from the start, and the
+        cartesian position of every point as x, y and z
+    """
+
+    start, end = (np.asarray(point, dtype=float) for point in (start, end))
+
+    fraction = np.linspace(0, 1, resolution)
+    points = start + fraction[:, None] * (end - start)
+
+    return _section(
+        n, l, m, points,
+        dims=["distance"],
+        coords={"distance": fraction * np.linalg.norm(end - start)},
+        Z=Z,
+        density=density,
+    )
@@ -7,7 +7,6 @@ from scipy.interpolate import RegularGridInterpolator
 from typing import Tuple, Optional
 
 
-@np.vectorize
 def convert_radial_to_cartesian(
     r: float, theta: float, phi: float
 ) -> Tuple[float, float, float]:
@@ -29,7 +28,6 @@ def convert_radial_to_cartesian(
     return x, y, z
 
 
-@np.vectorize
 def convert_cartesian_to_radial(
     x: float, y: float, z: float
 ) -> Tuple[float, float, float]:
@@ -44,9 +42,11 @@ def convert_cartesian_to_radial(
     returns:
     tuple, (r, theta, phi) radial coordinates
     """
-    r = np.sqrt(x**2 + y**2 + z**2)
+    r = np.sqrt(np.square(x) + np.square(y) + np.square(z))
     theta = np.arctan2(y, x)
-    phi = np.arccos(z / r)
+
+    # Any polar angle will do at the origin, take it to be 0
+    phi = np.arccos(np.clip(np.divide(z, r, out=np.ones_like(r), where=r > 0), -1, 1))
 
     return r, theta, phi
 
@@ -66,8 +66,8 @@ def clip_density(
 
     electron_density = wavefunction.get_density()
 
-    dens_range = np.nanmax(electron_density) - np.nanmin(electron_density)
-    abs_threshold = threshold * dens_range
+    dens_min, dens_max = wavefunction.get_density_range()
+    abs_threshold = threshold * (dens_max - dens_min)
 
     return np.where(electron_density < abs_threshold, np.nan, electron_density)
 
@@ -89,11 +89,6 @@ def interpolate_grid_function(
 
     assert new_resolution.keys() == grid_function.resolution.keys()
 
-    interp = RegularGridInterpolator(
-        [grid_function.get_coords()[dim].values for dim in grid_function.get_dims()],
-        grid_function.get_wavefunction(),
-    )
-
     n, l, m = grid_function.get_quantum_numbers()
 
     # e.g. RadialWavefunction or CartesianWavefunction
@@ -103,26 +98,75 @@ def interpolate_grid_function(
         n=n,
         l=l,
         m=m,
+        Z=grid_function.get_nuclear_charge(),
     )
 
     # e.g. xx, yy, zz or rr, tt, pp
-    # WOAH! Look out: meshgrid rotates the axes, so we need to be careful here.
-    # c2 and c1 are swapped
-    c2, c1, c3 = interp_grid.meshgrid_coords()
-
-    interp_grid.wavefunction.data = interp((c1, c2, c3))
+    interp_grid.wavefunction.data = sample_grid_function(
+        grid_function, interp_grid.meshgrid_coords()
+    )
 
     return interp_grid
 
 
+def sample_grid_function(
+    grid_function: datatypes.WavefunctionVolume, points: list[np.ndarray]
+) -> np.ndarray:
+    """
+    Linearly interpolates a grid function at arbitrary points within its grid.
+
+    args:
+    grid_function: datatypes.WavefunctionVolume, grid function to sample
+    points: list[np.ndarray], one array of coordinates per dimension, in get_dims() order
+
+    returns:
+    np.ndarray, interpolated values, with the shape of the point arrays
+    """
+
+    c1, c2, c3 = [grid_function.get_coords()[dim].values for dim in grid_function.get_dims()]
+
+    # WOAH! Look out: meshgrid rotates the axes, so the data (laid out as by
+    # np.meshgrid) runs along c2 on its first axis and c1 on its second.
+    interp = RegularGridInterpolator((c2, c1, c3), grid_function.get_wavefunction())
+
+    return interp((points[1], points[0], points[2]))
+
+
+def write_volume(
+    grid_function: datatypes.OneEAtomicWavefunction, path: str, density: bool = False
+) -> None:
+    """
+    Writes the normalised wavefunction (or density) to a .npy file slab by slab,
+    without ever holding the whole volume in memory.
+
+    args:
+    grid_function: datatypes.OneEAtomicWavefunction, wavefunction to write
+    path: str, path of the .npy file
+    density: bool, write the electron density rather than the wavefunction
+    """
+
+    slabs = grid_function.iter_slabs(density=density)
+    first = next(slabs)
+
+    shape = (grid_function.wavefunction.shape[1], *first.shape)
+    volume = np.lib.format.open_memmap(path, mode="w+", dtype=first.dtype, shape=shape)
+
+    volume[0] = first
+    for i, slab in enumerate(slabs, start=1):
+        volume[i] = slab
+
+    volume.flush()
+
+
 def abs_threshold_from_relative(
-    grid_function: np.ndarray, relative_threshold: float
+    grid_function: np.ndarray | datatypes.WavefunctionVolume, relative_threshold: float
 ) -> float:
     """
     Returns the absolute threshold value from a relative threshold value.
 
     args:
-    wavefunction: datatypes.WavefunctionVolume, wavefunction
+    grid_function: np.ndarray, grid values, or datatypes.WavefunctionVolume to use
+        its (cached) electron density
     relative_threshold: float, relative threshold value
 
     returns:
@@ -132,8 +176,12 @@ def abs_threshold_from_relative(
     if relative_threshold <= 0 or relative_threshold >= 1:
         raise ValueError("Relative threshold must be between 0 and 1.")
 
-    dens_range = np.nanmax(grid_function) - np.nanmin(grid_function)
-    abs_threshold = relative_threshold * dens_range
+    if isinstance(grid_function, datatypes.WavefunctionVolume):
+        dens_min, dens_max = grid_function.get_density_range()
+    else:
+        dens_min, dens_max = np.nanmin(grid_function), np.nanmax(grid_function)
+
+    abs_threshold = relative_threshold * (dens_max - dens_min)
 
     return abs_threshold
 
@@ -2,8 +2,9 @@ import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d.art3d import Poly3DCollection
 from orbitals import tools
 import numpy as np
+import xarray as xr
 
-from orbitals import datatypes, analysis, definitions
+from orbitals import datatypes, analysis, definitions, resampling
 
 def plot_clipped_points(wavefunction: datatypes.WavefunctionVolume, threshold: float, alpha: float = None):
     """
@@ -16,13 +17,17 @@ def plot_clipped_points(wavefunction: datatypes.WavefunctionVolume, threshold: f
     returns:
     matplotlib figure and axis
     """
-    
+
+    # Radial volumes are resampled, so points are plotted at their cartesian positions
+    wavefunction = resampling.as_cartesian(wavefunction)
+
     clipped_density = tools.clip_density(wavefunction, threshold)
 
     fig = plt.figure()
     ax = fig.add_subplot(projection='3d')
 
-    xx, yy, zz = wavefunction.meshgrid_coords()
+    # Sparse radial volumes keep their radial voxels, which are converted here
+    xx, yy, zz = wavefunction.cartesian_points()
 
     # Delete nan values from the clipped density for better visualisation
     # And performance... nan values are still points!?
@@ -72,3 +77,69 @@ def plot_isosurface(
     ax.set_axis_off()
 
     return fig, ax
+
+
+def plot_section(section: xr.DataArray, ax=None):
+    """
+    Plots a plane or line section from sections.evaluate_plane or
+    sections.evaluate_line. Densities are plotted as they are, wavefunctions
+    by their real part on a symmetric diverging colour scale. Planes are
+    drawn in their own orthonormal coordinates, so planes with
+    non-orthogonal u and v appear as parallelograms.
+
+    args:
+    section: xarray.DataArray, 2D plane or 1D line section
+    ax: matplotlib axis to plot on, or None to create a new figure
+
+    returns:
+    matplotlib figure and axis
+    """
+
+    if ax is None:
+        fig, ax = plt.subplots()
+    else:
+        fig = ax.figure
+
+    values = section.values if section.attrs.get("density") else section.values.real
+
+    if section.ndim == 1:
+        (dim,) = section.dims
+        ax.plot(section.coords[dim].values, values)
+        ax.set_xlabel(dim)
+        ax.set_ylabel("Density" if section.attrs.get("density") else "Re(ψ)")
+        return fig, ax
+
+    if section.attrs.get("density"):
+        colours = {"cmap": "viridis"}
+    else:
+        limit = np.abs(values).max()
+        colours = {"cmap": "RdBu_r", "vmin": -limit, "vmax": limit}
+
+    # Position of each point in an orthonormal basis of the plane, the first
+    # vector along u and the second perpendicular to it, about the centre
+    points = np.stack([section.coords[dim].values for dim in definitions.CartesianCoords], axis=-1)
+    e1 = points[-1, 0] - points[0, 0]
+    e1 /= np.linalg.norm(e1)
+    e2 = points[0, -1] - points[0, 0]
+    e2 -= np.dot(e2, e1) * e1
+    e2 /= np.linalg.norm(e2)
+
+    centred = points - points.mean(axis=(0, 1))
+    a, b = centred @ e1, centred @ e2
+
+    if np.allclose(a, a[:, :1]) and np.allclose(b, b[:1, :]):
+        # Orthogonal u and v give a rectangular grid, drawn quickly as an
+        # image. Points are pixel centres, so the edges lie half a spacing out.
+        da = (a[-1, 0] - a[0, 0]) / max(a.shape[0] - 1, 1) / 2
+        db = (b[0, -1] - b[0, 0]) / max(b.shape[1] - 1, 1) / 2
+        extent = (a[0, 0] - da, a[-1, 0] + da, b[0, 0] - db, b[0, -1] + db)
+        image = ax.imshow(values.T, origin="lower", extent=extent, **colours)
+    else:
+        image = ax.pcolormesh(a, b, values, shading="auto", **colours)
+
+    fig.colorbar(image, ax=ax)
+    ax.set_aspect("equal")
+    ax.set_xlabel(section.dims[0])
+    ax.set_ylabel(section.dims[1])
+
+    return fig, ax
@@ -1,6 +1,71 @@
-from orbitals import analysis
+import numpy as np
+import pytest
+
+from orbitals import analysis, datatypes
+from orbitals.definitions import A_0_STAR
 
 def test_extract_isosurface(simple_radial_wavefunction):
     verts, faces, normals, values = analysis.extract_isosurface(simple_radial_wavefunction, relative_threshold=0.5)
 
-    
\ No newline at end of file
+
+def test_exact_normals():
+    coarse = datatypes.CartesianWavefunction.new_1e_atomic_wavefunction(
+        resolution={"x": 16, "y": 16, "z": 16},
+        r_max=None,
+        n=2, l=1, m=0
+    )
+    coarse.eval_wavefunction()
+
+    verts, faces, normals, values = analysis.extract_isosurface(coarse, relative_threshold=0.3)
+    _, _, fd_normals, _ = analysis.extract_isosurface(coarse, relative_threshold=0.3, exact_normals=False)
+
+    assert normals.shape == verts.shape
+    assert np.allclose(np.linalg.norm(normals, axis=-1), 1)
+
+    # Exact normals point the same way as the finite difference ones
+    assert np.all(np.sum(normals * fd_normals, axis=-1) > 0.5)
+
+
+def test_kinetic_energy_density():
+    wavefunction = datatypes.CartesianWavefunction.new_1e_atomic_wavefunction(
+        resolution={"x": 40, "y": 40, "z": 40},
+        r_max=3,
+        n=2, l=1, m=1
+    )
+    wavefunction.eval_wavefunction()
+
+    # Analytic gradient agrees with finite differences on a fine grid,
+    # data laid out as (y, x, z)
+    coords = [wavefunction.get_coords()[dim].values for dim in ("y", "x", "z")]
+    dy, dx, dz = np.gradient(wavefunction.get_wavefunction(), *coords)
+    gradient = wavefunction.get_gradient()
+
+    interior = (slice(2, -2),) * 3
+    scale = np.abs(gradient).max()
+    assert np.allclose(gradient[..., 0][interior], dx[interior], atol=0.05 * scale)
+    assert np.allclose(gradient[..., 1][interior], dy[interior], atol=0.05 * scale)
+    assert np.allclose(gradient[..., 2][interior], dz[interior], atol=0.05 * scale)
+
+    tau = analysis.kinetic_energy_density(wavefunction)
+    assert tau.shape == wavefunction.get_wavefunction().shape
+    assert np.all(tau >= 0)
+
+
+@pytest.mark.parametrize("n, l, m, Z", [(1, 0, 0, 1), (2, 1, 1, 1), (3, 2, 0, 2)])
+def test_kinetic_energy_density_integral(n, l, m, Z):
+    # The integral of tau over all space is <T> = Z^2 / (2 n^2 a0^2),
+    # independently of the grid resolution
+    for points in (40, 60):
+        wavefunction = datatypes.CartesianWavefunction.new_1e_atomic_wavefunction(
+            resolution={"x": points, "y": points, "z": points},
+            r_max=None,
+            n=n, l=l, m=m,
+            enclosed_fraction=0.9999,
+            Z=Z
+        )
+        wavefunction.eval_wavefunction()
+
+        x = wavefunction.get_coords()["x"].values
+        integral = np.sum(analysis.kinetic_energy_density(wavefunction)) * (x[1] - x[0]) ** 3
+
+        assert np.isclose(integral, Z**2 / (2 * n**2 * A_0_STAR**2), rtol=0.01)
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+from orbitals import batch
+
+
+def test_read_manifest(tmp_path):
+    jobs = [
+        {"n": 2, "l": 1, "m": 0, "plot": "points"},
+        {"n": 1, "l": 0, "m": 0, "coordinates": "radial", "name": "1s"},
+    ]
+
+    json_path = tmp_path / "manifest.json"
+    json_path.write_text(json.dumps(jobs))
+
+    jsonl_path = tmp_path / "manifest.jsonl"
+    jsonl_path.write_text("\n".join(json.dumps(job) for job in jobs))
+
+    assert batch.read_manifest(str(json_path)) == batch.read_manifest(str(jsonl_path))
+
+    (job, named_job), failed = batch.read_manifest(str(json_path))
+    assert job.name == "210_cartesian_20_points"
+    assert named_job.name == "1s"
+    assert failed == []
+
+    # Invalid entries are reported as failures without dropping the valid ones
+    bad_path = tmp_path / "bad.jsonl"
+    bad_path.write_text(
+        "\n".join(
+            [
+                json.dumps(jobs[0]),
+                json.dumps({"n": 2, "l": 1, "m": 0, "plot": "hologram", "name": "bad_plot"}),
+                json.dumps({"n": 2, "l": 1, "m": 0, "colour": "red"}),
+                "{not json",
+            ]
+        )
+    )
+    jobs, failed = batch.read_manifest(str(bad_path))
+    assert [job.name for job in jobs] == ["210_cartesian_20_points"]
+    assert [result["name"] for result in failed] == ["bad_plot", "bad.jsonl line 3", "bad.jsonl line 4"]
+    assert all(result["status"] == "failed" for result in failed)
+
+    with pytest.raises(ValueError):
+        batch.Job(n=1, l=0, m=0, plot="hologram")
+
+
+def test_run_batch(tmp_path):
+    jobs = [
+        batch.Job(n=2, l=1, m=0, resolution=10, plot="mesh", threshold=0.4),
+        batch.Job(n=2, l=1, m=0, resolution=10, plot="isosurface", threshold=0.4),
+        # l must be less than n, so this job fails without stopping the others
+        batch.Job(n=1, l=2, m=0, resolution=10, plot="mesh"),
+    ]
+
+    results = batch.run_batch(jobs, str(tmp_path), workers=2)
+    status = {result["name"]: result["status"] for result in results}
+
+    assert status == {
+        "210_cartesian_10_mesh_t0.4": "done",
+        "210_cartesian_10_isosurface_t0.4": "done",
+        "120_cartesian_10_mesh": "failed",
+    }
+    assert (tmp_path / "210_cartesian_10_mesh_t0.4.obj").exists()
+    assert (tmp_path / "210_cartesian_10_isosurface_t0.4.png").exists()
+
+    # Rerunning resumes, only retrying the job with no output
+    results = batch.run_batch(jobs, str(tmp_path), workers=2)
+    status = {result["name"]: result["status"] for result in results}
+
+    assert status["210_cartesian_10_mesh_t0.4"] == "skipped"
+    assert status["210_cartesian_10_isosurface_t0.4"] == "skipped"
+    assert status["120_cartesian_10_mesh"] == "failed"
+
+
+def test_output_names():
+    base = batch.Job(n=2, l=1, m=0, resolution=10, plot="mesh")
+    variants = [
+        base,
+        batch.Job(n=2, l=1, m=0, resolution=10, plot="mesh", threshold=0.2),
+        batch.Job(n=2, l=1, m=0, resolution=10, plot="mesh", threshold=0.5),
+        batch.Job(n=2, l=1, m=0, resolution=10, plot="mesh", r_max=4.0),
+        batch.Job(n=2, l=1, m=0, resolution=10, plot="mesh", interpolate=20),
+        batch.Job(n=2, l=1, m=0, resolution=10, plot="mesh", Z=2),
+    ]
+
+    # Every setting which changes the output changes the default name
+    assert len({job.name for job in variants}) == len(variants)
+    assert base.name == "210_cartesian_10_mesh"
+
+
+def test_run_batch_rejects_duplicate_outputs(tmp_path):
+    jobs = [
+        batch.Job(n=2, l=1, m=0, resolution=10, plot="mesh", name="p"),
+        batch.Job(n=2, l=1, m=0, resolution=10, plot="mesh", threshold=0.5, name="p"),
+    ]
+
+    results = batch.run_batch(jobs, str(tmp_path), workers=1)
+
+    assert sorted(result["status"] for result in results) == ["done", "failed"]
+    assert "already written" in next(r["error"] for r in results if r["status"] == "failed")
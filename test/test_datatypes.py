@@ -1,11 +1,17 @@
 from scipy.sparse import data
+import matplotlib
+import matplotlib.pyplot as plt
 import numpy as np
 import pytest
 import sys
+import tracemalloc
 
 sys.path.append("..")  # Adjust the path to import from the parent directory
 
-from orbitals import datatypes, tools
+from orbitals import analysis, datatypes, electron_functions, tools, visualisation
+
+matplotlib.use("Agg")
+
 
 def test_RadialWavefunction():
     resolution = {"r": 100, "theta": 100, "phi": 100}
@@ -51,6 +57,9 @@ def test_CartesianWavefunction():
     assert density.wavefunction.coords["z"].shape == (100,)
     assert density.wavefunction.attrs["resolution"] == resolution
 
+    # Unevaluated volumes hold a read-only placeholder, new data is assigned
+    assert not density.wavefunction.data.flags.writeable
+
     assert np.isclose(np.sum(density.get_density()), 1.0)
 
     clipped_density = tools.clip_density(density, 0.5)
@@ -64,3 +73,355 @@ def test_CartesianWavefunction():
     assert meshgrid[1].shape == (100, 100, 100)
     assert meshgrid[2].shape == (100, 100, 100)
 
+
+def test_auto_r_max():
+    resolution = {"x": 10, "y": 10, "z": 10}
+    density = datatypes.CartesianWavefunction.new_1e_atomic_wavefunction(
+        resolution=resolution,
+        r_max=None,
+        n=2, l=1, m=0,
+        enclosed_fraction=0.9
+    )
+
+    assert density.r_max == datatypes.OneEAtomicWavefunction.auto_r_max(2, 1, 0.9)
+    assert np.isclose(density.wavefunction.coords["x"].max(), density.r_max)
+
+    # Enclosing more of the probability needs a bigger box
+    assert datatypes.OneEAtomicWavefunction.auto_r_max(2, 1, 0.99) > density.r_max
+
+
+def test_SparseWavefunction():
+    resolution = {"x": 20, "y": 20, "z": 20}
+    sparse = datatypes.SparseWavefunction.new_1e_atomic_wavefunction(
+        resolution=resolution,
+        r_max=None,
+        n=2, l=1, m=0,
+        density_floor=1e-2,
+        brick_size=8
+    )
+
+    dense = datatypes.CartesianWavefunction.new_1e_atomic_wavefunction(
+        resolution=resolution,
+        r_max=sparse.r_max,
+        n=2, l=1, m=0
+    )
+    dense.eval_wavefunction()
+
+    # Only part of the box is stored
+    assert sparse.wavefunction.dims == ("voxel",)
+    assert 0 < sparse.wavefunction.size < dense.wavefunction.size
+    assert np.isclose(np.sum(sparse.get_density()), 1.0)
+
+    # Brick-wise evaluation keeps the same voxels as sparsifying the dense volume
+    from_dense = datatypes.SparseWavefunction.from_volume(dense, density_floor=1e-2)
+    assert {tuple(i) for i in sparse.indices} == {tuple(i) for i in from_dense.indices}
+
+    # Per-voxel coordinates line up with the stored values
+    xx, yy, zz = sparse.meshgrid_coords()
+    dense_xx, dense_yy, dense_zz = dense.meshgrid_coords()
+    index = tuple(sparse.indices.T)
+    assert np.allclose(xx, dense_xx[index])
+    assert np.allclose(yy, dense_yy[index])
+    assert np.allclose(zz, dense_zz[index])
+
+    clipped_density = tools.clip_density(sparse, 0.5)
+    assert clipped_density.shape == sparse.wavefunction.shape
+
+    assert sparse.to_dense().wavefunction.shape == dense.wavefunction.shape
+
+    # The floor is measured against the analytic peak, so which voxels are
+    # kept does not depend on how the grid is split into bricks
+    for n, l, m in [(2, 0, 0), (1, 0, 0), (3, 2, 1)]:
+        kept = []
+        for brick_size in (4, 7, 16):
+            bricked = datatypes.SparseWavefunction.new_1e_atomic_wavefunction(
+                resolution=resolution,
+                r_max=sparse.r_max,
+                n=n, l=l, m=m,
+                density_floor=1e-3,
+                brick_size=brick_size
+            )
+            kept.append({tuple(i) for i in bricked.indices})
+
+        dense_nlm = datatypes.CartesianWavefunction.new_1e_atomic_wavefunction(
+            resolution=resolution,
+            r_max=sparse.r_max,
+            n=n, l=l, m=m
+        )
+        dense_nlm.eval_wavefunction()
+        kept.append({tuple(i) for i in datatypes.SparseWavefunction.from_volume(dense_nlm, 1e-3).indices})
+
+        assert all(voxels == kept[0] for voxels in kept)
+
+    with pytest.raises(TypeError):
+        sparse.iter_slabs()
+
+    # Isosurfaces are extracted from the dense volume
+    verts, _, _, _ = analysis.extract_isosurface(sparse, 0.5)
+    assert len(verts) > 0
+
+
+def test_SparseWavefunction_radial():
+    dense = datatypes.RadialWavefunction.new_1e_atomic_wavefunction(
+        resolution={"r": 20, "theta": 20, "phi": 20},
+        r_max=None,
+        n=2, l=1, m=1
+    )
+    dense.eval_wavefunction()
+
+    sparse = datatypes.SparseWavefunction.from_volume(dense, density_floor=1e-2)
+    stored = sparse.get_wavefunction().copy()
+
+    # Re-evaluating at the radial voxel coordinates reproduces the stored values
+    sparse.eval_wavefunction()
+    assert np.allclose(sparse.get_wavefunction(), stored / np.sum(np.abs(stored)))
+
+    restored = sparse.to_dense()
+    assert isinstance(restored, datatypes.RadialWavefunction)
+    assert restored.wavefunction.shape == dense.wavefunction.shape
+    assert np.allclose(restored.get_wavefunction()[tuple(sparse.indices.T)], sparse.get_wavefunction())
+
+    # Points are plotted at their cartesian positions, not their (r, theta, phi)
+    fig, ax = visualisation.plot_clipped_points(sparse, 0.1)
+    for lower, upper in (ax.get_xlim(), ax.get_ylim(), ax.get_zlim()):
+        assert -dense.r_max <= lower < 0 < upper <= dense.r_max
+    plt.close(fig)
+
+
+@pytest.mark.parametrize(
+    "wavefunction_type, resolution",
+    [
+        (datatypes.RadialWavefunction, {"r": 12, "theta": 12, "phi": 12}),
+        (datatypes.CartesianWavefunction, {"x": 12, "y": 12, "z": 12}),
+    ],
+)
+def test_iter_slabs(wavefunction_type, resolution):
+    wavefunction = wavefunction_type.new_1e_atomic_wavefunction(
+        resolution=resolution,
+        r_max=None,
+        n=3, l=2, m=1
+    )
+
+    slabs = np.stack([slab.copy() for slab in wavefunction.iter_slabs()])
+    densities = np.stack([slab.copy() for slab in wavefunction.iter_slabs(density=True)])
+
+    wavefunction.eval_wavefunction()
+
+    # Streamed slabs match the fully evaluated, normalised volume
+    assert np.allclose(slabs, wavefunction.get_wavefunction())
+    assert np.allclose(densities, wavefunction.get_density())
+
+
+@pytest.mark.parametrize(
+    "wavefunction_type, dims",
+    [
+        (datatypes.RadialWavefunction, ("r", "theta", "phi")),
+        (datatypes.CartesianWavefunction, ("x", "y", "z")),
+    ],
+)
+def test_write_volume_memory(wavefunction_type, dims, tmp_path):
+    points = 64
+    slab_bytes = points**2 * np.dtype(complex).itemsize
+
+    tracemalloc.start()
+    try:
+        wavefunction = wavefunction_type.new_1e_atomic_wavefunction(
+            resolution={dim: points for dim in dims},
+            r_max=None,
+            n=3, l=2, m=1
+        )
+        created = tracemalloc.get_traced_memory()[0]
+
+        tracemalloc.reset_peak()
+        tools.write_volume(wavefunction, tmp_path / "psi.npy")
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    # Neither building the volume nor streaming it to disk holds the whole
+    # grid, only a few slabs' worth of temporaries
+    assert created < points * slab_bytes / 10
+    assert peak < 16 * slab_bytes
+    assert np.load(tmp_path / "psi.npy").shape == (points, points, points)
+
+
+@pytest.mark.parametrize(
+    "wavefunction_type, resolution",
+    [
+        (datatypes.RadialWavefunction, {"r": 12, "theta": 12, "phi": 12}),
+        (datatypes.CartesianWavefunction, {"x": 12, "y": 12, "z": 12}),
+    ],
+)
+def test_nuclear_charge_from_reference(wavefunction_type, resolution):
+    reference = wavefunction_type.new_1e_atomic_wavefunction(
+        resolution=resolution,
+        r_max=None,
+        n=2, l=1, m=0
+    )
+    reference.eval_wavefunction()
+
+    # Relabelling the reference grid, shrunk by 1/Z
+    scaled = wavefunction_type.new_1e_atomic_wavefunction(
+        resolution=resolution,
+        r_max=None,
+        n=2, l=1, m=0,
+        Z=3,
+        reference=reference
+    )
+    assert np.isclose(scaled.r_max, reference.r_max / 3)
+    assert scaled.get_nuclear_charge() == 3
+
+    direct = wavefunction_type.new_1e_atomic_wavefunction(
+        resolution=resolution,
+        r_max=scaled.r_max,
+        n=2, l=1, m=0,
+        Z=3
+    )
+    direct.eval_wavefunction()
+    assert np.allclose(scaled.get_wavefunction(), direct.get_wavefunction())
+
+    # Resampling a finer reference onto a grid which lies inside it once
+    # scaled, which is only linearly interpolated
+    fine_reference = wavefunction_type.new_1e_atomic_wavefunction(
+        resolution={dim: 3 * points for dim, points in resolution.items()},
+        r_max=None,
+        n=2, l=1, m=0
+    )
+    fine_reference.eval_wavefunction()
+
+    resampled = wavefunction_type.new_1e_atomic_wavefunction(
+        resolution=resolution,
+        r_max=fine_reference.r_max / 4,
+        n=2, l=1, m=0,
+        Z=2,
+        reference=fine_reference
+    )
+    direct = wavefunction_type.new_1e_atomic_wavefunction(
+        resolution=resolution,
+        r_max=resampled.r_max,
+        n=2, l=1, m=0,
+        Z=2
+    )
+    direct.eval_wavefunction()
+
+    peak = direct.get_density().max()
+    assert np.allclose(resampled.get_density(), direct.get_density(), rtol=0, atol=0.05 * peak)
+
+    # Reference must be for the same orbital
+    with pytest.raises(ValueError):
+        wavefunction_type.new_1e_atomic_wavefunction(
+            resolution=resolution,
+            r_max=None,
+            n=2, l=1, m=1,
+            Z=2,
+            reference=reference
+        )
+
+    with pytest.raises(ValueError):
+        datatypes.SparseWavefunction.new_1e_atomic_wavefunction(
+            resolution={"x": 12, "y": 12, "z": 12},
+            r_max=None,
+            n=2, l=1, m=0,
+            Z=2,
+            reference=reference
+        )
+
+
+def test_cached_density():
+
+    wavefunction = datatypes.CartesianWavefunction.new_1e_atomic_wavefunction(
+        resolution={"x": 12, "y": 12, "z": 12},
+        r_max=None,
+        n=2, l=1, m=0
+    )
+    wavefunction.eval_wavefunction()
+
+    # A clip and an isosurface share one pass for the density and its range
+    tools.clip_density(wavefunction, 0.5)
+    tools.abs_threshold_from_relative(wavefunction, 0.5)
+    analysis.extract_isosurface(wavefunction, 0.5)
+    wavefunction.meshgrid_coords()
+    wavefunction.meshgrid_coords()
+
+    assert wavefunction.pass_counts["density"] == 1
+    assert wavefunction.pass_counts["range"] == 1
+    assert wavefunction.pass_counts["meshgrid"] == 1
+
+    # Cached arrays are shared, so are read only
+    with pytest.raises(ValueError):
+        wavefunction.get_density()[0, 0, 0] = 1.0
+
+    # Re-evaluating or assigning new data invalidates the cache
+    wavefunction.eval_wavefunction()
+    wavefunction.get_density()
+    assert wavefunction.pass_counts["density"] == 2
+
+    wavefunction.wavefunction.data = wavefunction.get_wavefunction() * 2
+    wavefunction.get_density()
+    assert wavefunction.pass_counts["density"] == 3
+
+    # In-place edits can't leave the cache stale, they raise instead...
+    old_density = wavefunction.get_density()
+    with pytest.raises(ValueError):
+        wavefunction.wavefunction *= 3
+    with pytest.raises(ValueError):
+        wavefunction.wavefunction[0, 0, 0] = 5.0
+    with pytest.raises(ValueError):
+        wavefunction.get_wavefunction()[0, 0, 0] = 1.0
+    assert np.allclose(wavefunction.get_density(), old_density)
+
+    # ...until the cache is explicitly invalidated
+    wavefunction.invalidate_cache()
+    wavefunction.wavefunction[0, 0, 0] = 5.0
+    assert not np.allclose(wavefunction.get_density(), old_density)
+    assert wavefunction.pass_counts["density"] == 4
+
+    wavefunction.invalidate_cache()
+    wavefunction.wavefunction *= 3
+    density = np.abs(wavefunction.get_wavefunction()) ** 2
+    assert np.isclose(wavefunction.get_density_range()[1], density.max() / density.sum())
+    assert wavefunction.pass_counts["density"] == 5
+
+    assert np.isclose(
+        wavefunction.get_density_percentile(100), wavefunction.get_density_range()[1]
+    )
+
+
+def test_CompositeWavefunction():
+    resolution = {"x": 31, "y": 31, "z": 31}
+    spacing = 2 * 8.0 / 30
+
+    # Two p orbitals on grid points share a template; the s orbital does not
+    centres = [[-3 * spacing, 0, 0], [3 * spacing, 0, 0], [0.37, 0.2, -1.1]]
+    quantum_numbers = [[2, 1, 1], [2, 1, 1], [1, 0, 0]]
+    coefficients = [1, -1, 0.5]
+
+    composite = datatypes.CompositeWavefunction.new_composite_wavefunction(
+        resolution, 8.0, centres, quantum_numbers, coefficients, density_floor=1e-10
+    )
+    composite.eval_wavefunction()
+
+    assert composite.pass_counts["template"] == 1
+    assert composite.pass_counts["brick"] == 1
+    assert np.isclose(np.sum(composite.get_density()), 1.0)
+
+    # Equal to the sum of the contributions over the whole box
+    xx, yy, zz = composite.meshgrid_coords()
+    expected = sum(
+        coefficient * electron_functions.cartesian_wavefunction(*qn, xx - c[0], yy - c[1], zz - c[2])
+        for c, qn, coefficient in zip(centres, quantum_numbers, coefficients)
+    )
+    expected /= np.sum(np.abs(expected))
+
+    assert np.allclose(composite.get_wavefunction(), expected, rtol=0, atol=1e-4 * np.abs(expected).max())
+
+    # r_max is chosen to enclose every contribution
+    auto = datatypes.CompositeWavefunction.new_composite_wavefunction(
+        resolution, None, centres, quantum_numbers, coefficients
+    )
+    assert np.isclose(auto.r_max, 3 * spacing + datatypes.OneEAtomicWavefunction.auto_r_max(2, 1))
+
+    with pytest.raises(ValueError):
+        datatypes.CompositeWavefunction.new_composite_wavefunction(
+            resolution, 8.0, centres, quantum_numbers[:2], coefficients
+        )
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+from scipy.integrate import trapezoid
+
+from orbitals import electron_functions
+from orbitals.definitions import A_0_STAR
+
+
+@pytest.mark.parametrize("n, l", [(1, 0), (2, 0), (2, 1), (3, 2), (4, 1)])
+def test_radial_function_normalised(n, l):
+    r = np.linspace(0, 100 * n * A_0_STAR, 100000)
+    assert np.isclose(
+        trapezoid(electron_functions.radial_probability_density(n, l, r), r), 1.0
+    )
+
+
+def test_enclosing_radius():
+    # 1s: 99% of the probability lies within ~4.2 Bohr radii
+    assert np.isclose(electron_functions.enclosing_radius(1, 0, 0.99) / A_0_STAR, 4.2, atol=0.05)
+
+    # Enclosed radius grows with the fraction and with n
+    assert electron_functions.enclosing_radius(1, 0, 0.5) < electron_functions.enclosing_radius(1, 0, 0.9)
+    assert electron_functions.enclosing_radius(1, 0, 0.9) < electron_functions.enclosing_radius(2, 0, 0.9)
+
+    with pytest.raises(ValueError):
+        electron_functions.enclosing_radius(1, 0, 1.0)
+
+
+def test_density_cutoff_radius():
+    n, l, floor = 2, 1, 1e-3
+    cutoff = electron_functions.density_cutoff_radius(n, l, floor)
+
+    r = np.linspace(cutoff, 4 * cutoff, 1000)
+    peak = np.max(electron_functions.radial_function(n, l, np.linspace(0, cutoff, 1000)) ** 2)
+    assert np.all(electron_functions.radial_function(n, l, r) ** 2 < floor * peak)
+
+
+def test_nuclear_charge_scaling():
+    # psi_Z(r) = Z^(3/2) psi_1(Z r)
+    r = np.linspace(0, 5, 50)
+    for Z in [2, 3]:
+        assert np.allclose(
+            electron_functions.radial_function(3, 1, r, Z),
+            Z**1.5 * electron_functions.radial_function(3, 1, Z * r),
+        )
+        assert np.isclose(
+            electron_functions.enclosing_radius(2, 0, 0.9, Z),
+            electron_functions.enclosing_radius(2, 0, 0.9) / Z,
+        )
+
+
+def test_wavefunction_orientation():
+    # 2p_z has its lobes along z and a node in the xy plane
+    # (r, theta, phi) with theta azimuthal and phi polar
+    on_axis = electron_functions.wavefunction(2, 1, 0, 1.0, 0.3, 0.0)
+    in_plane = electron_functions.wavefunction(2, 1, 0, 1.0, 0.3, np.pi / 2)
+
+    assert np.abs(on_axis) > 0
+    assert np.isclose(np.abs(in_plane), 0)
+
+
+@pytest.mark.parametrize("n, l, m", [(1, 0, 0), (2, 1, 0), (2, 1, 1), (3, 2, -1), (4, 3, 2)])
+@pytest.mark.parametrize("Z", [1, 2])
+def test_wavefunction_gradient(n, l, m, Z):
+    rng = np.random.default_rng(0)
+    x, y, z = rng.normal(scale=1.5, size=(3, 100))
+
+    def psi(x, y, z):
+        return electron_functions.wavefunction(n, l, m, *electron_functions._spherical_coords(x, y, z), Z=Z)
+
+    h = 1e-5
+    finite_difference = np.stack(
+        [
+            (psi(x + h, y, z) - psi(x - h, y, z)) / (2 * h),
+            (psi(x, y + h, z) - psi(x, y - h, z)) / (2 * h),
+            (psi(x, y, z + h) - psi(x, y, z - h)) / (2 * h),
+        ],
+        axis=-1,
+    )
+
+    gradient = electron_functions.wavefunction_gradient(n, l, m, x, y, z, Z=Z)
+    assert np.allclose(gradient, finite_difference, atol=1e-8 * np.abs(finite_difference).max())
+
+    # Well defined on the z axis, where the angles are not
+    assert np.all(np.isfinite(electron_functions.wavefunction_gradient(n, l, m, 0.0, 0.0, [-1.0, 0.5])))
+
+
+@pytest.mark.parametrize("n, l, m", [(1, 0, 0), (2, 1, 1), (3, 2, -1), (4, 3, 2)])
+@pytest.mark.parametrize("Z", [1, 3])
+def test_wavefunction_laplacian(n, l, m, Z):
+    # Schrodinger equation for a hydrogen-like ion, lengths in Angstrom:
+    # lap psi = (Z^2 / (n a0)^2 - 2 Z / (a0 r)) psi
+    rng = np.random.default_rng(0)
+    x, y, z = rng.normal(scale=1.5, size=(3, 100))
+    r, theta, phi = electron_functions._spherical_coords(x, y, z)
+
+    psi = electron_functions.wavefunction(n, l, m, r, theta, phi, Z=Z)
+    expected = (Z**2 / (n * A_0_STAR) ** 2 - 2 * Z / (A_0_STAR * r)) * psi
+
+    assert np.allclose(electron_functions.wavefunction_laplacian(n, l, m, x, y, z, Z=Z), expected)
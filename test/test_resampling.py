@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from orbitals import datatypes, resampling
+from orbitals.definitions import CartesianCoords, RadialCoords
+
+
+def _radial_volume(n, l, m, r_max=12.0, points=40, endpoint=True):
+    volume = datatypes.RadialWavefunction.new_1e_atomic_wavefunction(
+        resolution={dim: points for dim in RadialCoords},
+        r_max=r_max,
+        n=n, l=l, m=m
+    )
+
+    if not endpoint:
+        volume.wavefunction = volume.wavefunction.assign_coords(
+            {RadialCoords.THETA: np.linspace(0, 2 * np.pi, points, endpoint=False)}
+        )
+
+    return volume
+
+
+@pytest.mark.parametrize("endpoint", [True, False])
+def test_spherical_to_cartesian_coordinates(endpoint):
+    # Resampling the cartesian coordinates themselves recovers the target grid
+    source = _radial_volume(1, 0, 0, r_max=3.0, endpoint=endpoint)
+    rr, tt, pp = source.meshgrid_coords()
+
+    resolution = {dim: 30 for dim in CartesianCoords}
+    plan = resampling.ResamplingPlan.spherical_to_cartesian(source, resolution, r_max=1.5)
+
+    xx, yy, zz = np.meshgrid(*[np.linspace(-1.5, 1.5, 30)] * 3)
+    assert np.allclose(plan.apply(rr * np.sin(pp) * np.cos(tt)), xx, atol=0.01)
+    assert np.allclose(plan.apply(rr * np.sin(pp) * np.sin(tt)), yy, atol=0.01)
+    assert np.allclose(plan.apply(rr * np.cos(pp)), zz, atol=0.01)
+
+    # Corners of the box lie outside the source grid
+    plan = resampling.ResamplingPlan.spherical_to_cartesian(source, resolution)
+    assert plan.apply(np.ones(source.wavefunction.shape))[0, 0, 0] == 0
+
+
+def test_to_cartesian():
+    quantum_numbers = [(3, 0, 0), (3, 2, 1), (3, 2, -2)]
+    sources = [_radial_volume(*qn) for qn in quantum_numbers]
+    for source in sources:
+        source.eval_wavefunction()
+
+    resolution = {dim: 20 for dim in CartesianCoords}
+    plan = resampling.ResamplingPlan.spherical_to_cartesian(sources[0], resolution, r_max=7.0)
+    resampled = plan.to_cartesian(sources)
+
+    for qn, volume in zip(quantum_numbers, resampled):
+        direct = datatypes.CartesianWavefunction.new_1e_atomic_wavefunction(
+            resolution=resolution,
+            r_max=7.0,
+            n=qn[0], l=qn[1], m=qn[2]
+        )
+        direct.eval_wavefunction()
+
+        assert volume.get_quantum_numbers() == qn
+        assert np.max(np.abs(volume.get_density() - direct.get_density())) < 0.1 * direct.get_density().max()
+
+    # Plans only apply to volumes on their source grid
+    other = _radial_volume(3, 0, 0, r_max=6.0)
+    other.eval_wavefunction()
+    with pytest.raises(ValueError):
+        plan.to_cartesian([other])
+
+
+def test_as_cartesian(simple_radial_wavefunction):
+    volume = resampling.as_cartesian(simple_radial_wavefunction)
+
+    assert isinstance(volume, datatypes.CartesianWavefunction)
+    assert volume.wavefunction.shape == (10, 10, 10)
+    assert resampling.as_cartesian(volume) is volume
+
+    # The plan is built once per source grid, and kept compact
+    plan = resampling.default_plan(simple_radial_wavefunction)
+    assert resampling.default_plan(simple_radial_wavefunction) is plan
+    assert plan.indices.dtype == np.int32
+    assert plan.weights.dtype == np.float32
+
+    other = _radial_volume(2, 1, 0, r_max=5.0, points=10)
+    assert resampling.default_plan(other) is not plan
@@ -0,0 +1,99 @@
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+import scipy.special
+
+from orbitals import datatypes, electron_functions, sections, visualisation
+
+matplotlib.use("Agg")
+
+
+def test_evaluate_plane_matches_volume_slice():
+    r_max = 8.0
+    volume = datatypes.CartesianWavefunction.new_1e_atomic_wavefunction(
+        resolution={"x": 21, "y": 21, "z": 21}, r_max=r_max, n=3, l=2, m=1
+    )
+    volume.eval_wavefunction()
+
+    # xz plane through the nucleus, the middle of the volume's y axis
+    plane = sections.evaluate_plane(
+        3, 2, 1, origin=(0, 0, 0), u=(r_max, 0, 0), v=(0, 0, r_max), resolution=21
+    )
+
+    assert plane.dims == ("s", "t")
+    assert plane.shape == (21, 21)
+    assert np.allclose(plane.coords["s"], volume.get_coords()["x"])
+    assert np.allclose(plane.coords["x"][:, 0], volume.get_coords()["x"])
+    assert np.allclose(plane.coords["y"], 0)
+
+    # Volume data is laid out (y, x, z), and normalised over the grid
+    volume_slice = volume.get_wavefunction()[10]
+    peak = np.unravel_index(np.abs(volume_slice).argmax(), volume_slice.shape)
+    assert np.allclose(plane.values * volume_slice[peak] / plane.values[peak], volume_slice)
+
+    # Rectangular and tilted planes
+    tilted = sections.evaluate_plane(
+        2, 1, 0, origin=(0, 0, 1), u=(1, 1, 0), v=(0, 0, 2), resolution=(8, 5), density=True
+    )
+    assert tilted.shape == (8, 5)
+    assert np.allclose(tilted.coords["s"][-1], np.sqrt(2))
+    assert np.all(tilted.values >= 0)
+
+
+def test_evaluate_line_is_radial_profile():
+    line = sections.evaluate_line(
+        2, 1, 0, start=(0, 0, 0), end=(0, 0, 10), resolution=50, density=True, Z=2
+    )
+
+    r = np.linspace(0, 10, 50)
+    expected = (
+        electron_functions.radial_function(2, 1, r, Z=2) ** 2
+        * np.abs(scipy.special.sph_harm(0, 1, 0, 0)) ** 2
+    )
+
+    assert line.dims == ("distance",)
+    assert np.allclose(line.coords["distance"], r)
+    assert np.allclose(line.coords["z"], r)
+    assert np.allclose(line.values, expected)
+
+
+@pytest.mark.parametrize("density", [True, False])
+def test_plot_section(density):
+    plane = sections.evaluate_plane(
+        2, 1, 1, origin=(0, 0, 0), u=(5, 0, 0), v=(0, 5, 0), resolution=16, density=density
+    )
+    line = sections.evaluate_line(2, 1, 1, (-5, 0, 0), (5, 0, 0), 16, density=density)
+
+    for section in (plane, line):
+        fig, ax = visualisation.plot_section(section)
+        assert ax.get_xlabel() == section.dims[0]
+        plt.close(fig)
+
+
+def test_plot_section_oblique_plane():
+    # u and v at 45 degrees, so the plane is drawn as a parallelogram
+    plane = sections.evaluate_plane(
+        2, 1, 1, origin=(0, 0, 0), u=(5, 0, 0), v=(5, 5, 0), resolution=16, density=True
+    )
+
+    fig, ax = visualisation.plot_section(plane)
+
+    (mesh,) = ax.collections
+    corners = mesh.get_coordinates()[[0, 0, -1, -1], [0, -1, 0, -1]]
+    assert np.allclose(corners[:, 1], [-5, 5, -5, 5], atol=1)
+    assert np.allclose(corners[:, 0], [-10, 0, 0, 10], atol=1)
+    plt.close(fig)
+
+
+def test_plot_section_extent():
+    # Pixels are centred on the points, so both paths cover the same area
+    plane = sections.evaluate_plane(
+        2, 1, 0, origin=(0, 0, 0), u=(4, 0, 0), v=(0, 0, 2), resolution=(5, 3), density=True
+    )
+
+    fig, ax = visualisation.plot_section(plane)
+
+    (image,) = ax.images
+    assert np.allclose(image.get_extent(), [-5, 5, -3, 3])
+    plt.close(fig)
@@ -60,6 +60,13 @@ def test_interpolate_grid_function(simple_radial_wavefunction):
     assert np.allclose(coords[RadialCoords.PHI].values, expected_phi)
 
 
+def test_write_volume(simple_radial_wavefunction, tmp_path):
+    path = tmp_path / "density.npy"
+    tools.write_volume(simple_radial_wavefunction, str(path), density=True)
+
+    assert np.allclose(np.load(path), simple_radial_wavefunction.get_density())
+
+
 def test_clip_density(simple_radial_wavefunction):
     # Test with a threshold of 0.5 (50% of density range)
     clipped_density = tools.clip_density(simple_radial_wavefunction, 0.5)